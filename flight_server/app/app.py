@@ -82,8 +82,15 @@ class DuckHouseFlightServer(flight.FlightServerBase):
                 write_arrow_to_iceberg(table_name, arrow_table)
             elif target == "duckdb":
                 logger.info("Writing to DuckDB (for local, lightweight queries)")
-                df = arrow_table.to_pandas()
-                self.db.execute(f"CREATE OR REPLACE TABLE {table_name} AS SELECT * FROM df")
+                # DuckDB scans the Arrow buffers in place; the cursor keeps the
+                # registration private to this upload
+                cursor = self.db.cursor()
+                try:
+                    cursor.register("arrow_upload", arrow_table)
+                    cursor.execute(f"CREATE OR REPLACE TABLE {table_name} AS SELECT * FROM arrow_upload")
+                    cursor.unregister("arrow_upload")
+                finally:
+                    cursor.close()
             else:
                 raise ValueError(f"Unsupported target: {target}. Use 'duckdb', 'iceberg', or 'auto'")
 
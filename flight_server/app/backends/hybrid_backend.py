@@ -20,6 +20,11 @@ class HybridBackend(PyIcebergBackend):
     et DuckDB pour l'exécution rapide + vues synchronisées.
     """
 
+    _VIEW_SQL_TEMPLATE = (
+        "CREATE OR REPLACE VIEW {name} AS "
+        "SELECT * FROM iceberg_scan('{path}', version='?', allow_moved_paths=true);"
+    )
+
     def __init__(self, warehouse_path=None, **kwargs):
         super().__init__(warehouse_path=warehouse_path, **kwargs)
         self.duckdb_path = None
@@ -97,19 +102,16 @@ class HybridBackend(PyIcebergBackend):
         """
         tables = self.catalog.list_tables(self.namespace)
 
+        # Toutes les vues sont (re)créées en un seul appel multi-instructions
+        statements = []
         for (_, table_name) in tables:
             path = f"{self.warehouse_path}/{self.namespace}.db/{table_name}"
-            escaped = path.replace("'", "''")
             safe_name = f'"{table_name}"' if "-" in table_name else table_name
-
-            self.duckdb_con.raw_sql(f"""
-                CREATE OR REPLACE VIEW {safe_name} AS
-                SELECT * FROM iceberg_scan(
-                    '{escaped}',
-                    version='?',
-                    allow_moved_paths=true
-                );
-            """)
+            statements.append(
+                self._VIEW_SQL_TEMPLATE.format(name=safe_name, path=path.replace("'", "''"))
+            )
+        if statements:
+            self.duckdb_con.raw_sql("\n".join(statements))
 
     def _setup_duckdb_connection(self):
         """Initialise les extensions DuckDB nécessaires à Iceberg."""
@@ -126,11 +128,14 @@ class HybridBackend(PyIcebergBackend):
         ts = datetime.datetime.now(datetime.UTC).strftime("%Y%m%d_%H%M%S")
         snap_path = os.path.join(self.snapshot_dir, f"{ts}.duckdb")
 
-        for t in self.duckdb_con.tables:
-            self.duckdb_con.raw_sql(f"CREATE OR REPLACE TABLE {t}_snapshot AS SELECT * FROM {t};")
-
-        self.duckdb_con.raw_sql(f"CHECKPOINT '{self.duckdb_path}';")
-        shutil.copy(self.duckdb_path, snap_path)
+        # Copies + CHECKPOINT envoyés en un seul lot multi-instructions
+        statements = [
+            f"CREATE OR REPLACE TABLE {t}_snapshot AS SELECT * FROM {t};"
+            for t in self.duckdb_con.tables
+        ]
+        statements.append(f"CHECKPOINT '{self.duckdb_path}';")
+        self.duckdb_con.raw_sql("\n".join(statements))
+        shutil.copyfile(self.duckdb_path, snap_path)
 
         logger.info(f"Snapshot DuckDB écrit : {snap_path}")
 
@@ -3,12 +3,16 @@ Query orchestrator that decides between Trino (Iceberg) and DuckDB based on data
 """
 import logging
 import re
-from typing import Dict, List, Optional, Union, Any
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple, Union, Any
 from dataclasses import dataclass
 from enum import Enum
 
 import pandas as pd
 import pyarrow as pa
+import sqlglot
+from sqlglot import exp
 
 from .trino_client import get_trino_client, TrinoClient
 from .utils import get_duckdb_connection
@@ -34,10 +38,9 @@ class DataSource(Enum):
     HYBRID = "hybrid"
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class QueryMetrics:
     """Metrics for query routing decisions."""
-    estimated_rows: int = 0
     table_count: int = 0
     has_joins: bool = False
     has_aggregations: bool = False
@@ -46,6 +49,135 @@ class QueryMetrics:
     query_type: QueryType = QueryType.SIMPLE_SELECT
 
 
+# How long a cached row-count estimate stays valid
+SIZE_ESTIMATE_TTL_SECONDS = 60
+
+# How long a cached routing decision stays valid
+ROUTE_CACHE_TTL_SECONDS = 300
+
+# Patterns compiled once; used for routing and for SQL that sqlglot cannot parse
+TABLE_PATTERN = re.compile(r'from\s+([a-zA-Z_][a-zA-Z0-9_]*)|join\s+([a-zA-Z_][a-zA-Z0-9_]*)')
+JOIN_PATTERN = re.compile(r'\bjoin\b')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def normalize_query(query: str) -> str:
+    """Collapse whitespace and lowercase a query so equivalent texts share a cache entry."""
+    return WHITESPACE_PATTERN.sub(' ', query).strip().lower()
+
+
+@lru_cache(maxsize=1024)
+def _parse_query(query_lower: str) -> Optional[exp.Expression]:
+    """Parse a normalized query once for both fingerprinting and analysis.
+    
+    The tree is cached and shared, so callers must not modify it. Returns None
+    for SQL that sqlglot cannot tokenize or parse.
+    """
+    try:
+        return sqlglot.parse_one(query_lower)
+    except sqlglot.errors.SqlglotError as e:
+        logger.debug(f"Falling back to pattern analysis, could not parse query: {e}")
+        return None
+
+
+@lru_cache(maxsize=1024)
+def query_fingerprint(query_lower: str) -> str:
+    """Return ``query_lower`` with every literal replaced by ``?``.
+    
+    Queries that differ only in their constants share a fingerprint; SQL
+    that sqlglot cannot tokenize or parse is its own fingerprint.
+    """
+    tree = _parse_query(query_lower)
+    if tree is None:
+        return query_lower
+    # transform() works on a copy, leaving the shared tree intact
+    return tree.transform(
+        lambda node: exp.Placeholder() if isinstance(node, exp.Literal) else node
+    ).sql()
+
+
+def _scan_syntax_tree(tree: exp.Expression) -> Tuple[int, bool, bool, bool, bool, bool]:
+    """Collect routing features from a parsed query in a single walk."""
+    table_names = set()
+    has_joins = has_aggregations = has_subqueries = has_window = has_cte = False
+    
+    for node in tree.walk():
+        if isinstance(node, exp.Table):
+            table_names.add(node.name)
+        elif isinstance(node, exp.Join):
+            has_joins = True
+        elif isinstance(node, (exp.AggFunc, exp.Group, exp.Having)):
+            has_aggregations = True
+        elif isinstance(node, exp.Subquery):
+            has_subqueries = True
+        elif isinstance(node, exp.Select) and node is not tree and node.find_ancestor(exp.Select):
+            has_subqueries = True
+        elif isinstance(node, exp.Window):
+            has_window = True
+        elif isinstance(node, exp.With):
+            has_cte = True
+    
+    return len(table_names), has_joins, has_aggregations, has_subqueries, has_window, has_cte
+
+
+def _scan_with_patterns(query_lower: str) -> Tuple[int, bool, bool, bool, bool, bool]:
+    """Collect routing features with keyword and regex checks, for SQL sqlglot cannot parse."""
+    tables = TABLE_PATTERN.findall(query_lower)
+    table_names = [t[0] or t[1] for t in tables]
+    aggregation_keywords = ['group by', 'having', 'count(', 'sum(', 'avg(', 'max(', 'min(']
+    
+    return (
+        len(set(table_names)),
+        bool(JOIN_PATTERN.search(query_lower)),
+        any(keyword in query_lower for keyword in aggregation_keywords),
+        '(' in query_lower and 'select' in query_lower,
+        'window' in query_lower or 'over(' in query_lower,
+        'recursive' in query_lower or 'with' in query_lower,
+    )
+
+
+@lru_cache(maxsize=1024)
+def _analyze_normalized_query(query_lower: str) -> QueryMetrics:
+    """Analyze a normalized query; results are cached per query text."""
+    tree = _parse_query(query_lower)
+    features = _scan_with_patterns(query_lower) if tree is None else _scan_syntax_tree(tree)
+    table_count, has_joins, has_aggregations, has_subqueries, has_window, has_cte = features
+    
+    # Calculate complexity score
+    complexity_score = 0.0
+    complexity_score += table_count * 1.0
+    complexity_score += 2.0 if has_joins else 0.0
+    complexity_score += 1.5 if has_aggregations else 0.0
+    complexity_score += 2.0 if has_subqueries else 0.0
+    
+    # Additional complexity factors
+    if has_window:
+        complexity_score += 2.0
+    if has_cte:
+        complexity_score += 1.5
+    
+    # Determine query type
+    if has_aggregations and table_count > 1:
+        query_type = QueryType.ANALYTICAL
+    elif has_joins:
+        query_type = QueryType.JOIN
+    elif has_aggregations:
+        query_type = QueryType.AGGREGATION
+    elif complexity_score > 3.0:
+        query_type = QueryType.COMPLEX
+    else:
+        query_type = QueryType.SIMPLE_SELECT
+    
+    return QueryMetrics(
+        table_count=table_count,
+        has_joins=has_joins,
+        has_aggregations=has_aggregations,
+        has_subqueries=has_subqueries,
+        complexity_score=complexity_score,
+        query_type=query_type
+    )
+
+
 class QueryOrchestrator:
     """
     Orchestrates queries between Trino (Iceberg) and DuckDB based on:
@@ -65,6 +197,10 @@ class QueryOrchestrator:
         
         # Table registry (which tables are in which backend)
         self.table_registry = self._build_table_registry()
+        
+        # Per-instance caches, so they do not keep orchestrators alive or mix their registries
+        self._estimate_table_rows = lru_cache(maxsize=256)(self._count_table_rows)
+        self._route_decision = lru_cache(maxsize=512)(self._decide_route)
     
     def _build_table_registry(self) -> Dict[str, DataSource]:
         """Build registry of which tables are in which backend."""
@@ -90,6 +226,12 @@ class QueryOrchestrator:
         
         return registry
     
+    def register_table(self, table_name: str, source: DataSource):
+        """Record which backend holds ``table_name`` and drop cached estimates and routes."""
+        self.table_registry[table_name] = source
+        self._estimate_table_rows.cache_clear()
+        self._route_decision.cache_clear()
+    
     def _get_trino_client(self) -> TrinoClient:
         """Get or create Trino client."""
         if self.trino_client is None:
@@ -103,57 +245,24 @@ class QueryOrchestrator:
         return self.duckdb_connection
     
     def _analyze_query(self, query: str) -> QueryMetrics:
-        """Analyze query to determine routing strategy."""
-        query_lower = query.lower()
-        metrics = QueryMetrics()
-        
-        # Extract table names
-        table_pattern = r'from\s+([a-zA-Z_][a-zA-Z0-9_]*)|join\s+([a-zA-Z_][a-zA-Z0-9_]*)'
-        tables = re.findall(table_pattern, query_lower)
-        table_names = [t[0] or t[1] for t in tables]
-        metrics.table_count = len(set(table_names))
-        
-        # Check for joins
-        metrics.has_joins = bool(re.search(r'\bjoin\b', query_lower))
-        
-        # Check for aggregations
-        aggregation_keywords = ['group by', 'having', 'count(', 'sum(', 'avg(', 'max(', 'min(']
-        metrics.has_aggregations = any(keyword in query_lower for keyword in aggregation_keywords)
-        
-        # Check for subqueries
-        metrics.has_subqueries = '(' in query and 'select' in query_lower
-        
-        # Calculate complexity score
-        complexity_score = 0.0
-        complexity_score += metrics.table_count * 1.0
-        complexity_score += 2.0 if metrics.has_joins else 0.0
-        complexity_score += 1.5 if metrics.has_aggregations else 0.0
-        complexity_score += 2.0 if metrics.has_subqueries else 0.0
+        """Analyze query to determine routing strategy.
         
-        # Additional complexity factors
-        if 'window' in query_lower or 'over(' in query_lower:
-            complexity_score += 2.0
-        if 'recursive' in query_lower or 'with' in query_lower:
-            complexity_score += 1.5
-        
-        metrics.complexity_score = complexity_score
-        
-        # Determine query type
-        if metrics.has_aggregations and metrics.table_count > 1:
-            metrics.query_type = QueryType.ANALYTICAL
-        elif metrics.has_joins:
-            metrics.query_type = QueryType.JOIN
-        elif metrics.has_aggregations:
-            metrics.query_type = QueryType.AGGREGATION
-        elif metrics.complexity_score > 3.0:
-            metrics.query_type = QueryType.COMPLEX
-        else:
-            metrics.query_type = QueryType.SIMPLE_SELECT
-        
-        return metrics
+        The analysis is cached per normalized query; the metrics are immutable,
+        so the cached instance is shared.
+        """
+        return _analyze_normalized_query(normalize_query(query))
     
     def _estimate_data_size(self, query: str, table_names: List[str]) -> int:
-        """Estimate data size for the query."""
+        """Estimate data size for the query.
+        
+        Row counts depend only on the tables involved, so estimates are cached
+        per table set and refreshed every ``SIZE_ESTIMATE_TTL_SECONDS``.
+        """
+        bucket = int(time.monotonic() // SIZE_ESTIMATE_TTL_SECONDS)
+        return self._estimate_table_rows(tuple(sorted(table_names)), bucket)
+    
+    def _count_table_rows(self, table_names: Tuple[str, ...], bucket: int) -> int:
+        """Sum row counts for ``table_names``; ``bucket`` changes every TTL window to expire entries."""
         total_rows = 0
         
         for table_name in table_names:
@@ -195,11 +304,19 @@ class QueryOrchestrator:
         return total_rows
     
     def _should_use_trino(self, query: str, metrics: QueryMetrics) -> bool:
-        """Determine if query should use Trino instead of DuckDB."""
+        """Determine if query should use Trino instead of DuckDB.
+        
+        Decisions are cached per query fingerprint, so repeated queries that
+        differ only in literals skip size estimation for ``ROUTE_CACHE_TTL_SECONDS``.
+        """
+        bucket = int(time.monotonic() // ROUTE_CACHE_TTL_SECONDS)
+        return self._route_decision(query_fingerprint(normalize_query(query)), metrics, bucket)
+    
+    def _decide_route(self, query: str, metrics: QueryMetrics, bucket: int) -> bool:
+        """Route the fingerprinted ``query``; ``bucket`` changes every TTL window to expire entries."""
         
         # Extract table names for analysis
-        table_pattern = r'from\s+([a-zA-Z_][a-zA-Z0-9_]*)|join\s+([a-zA-Z_][a-zA-Z0-9_]*)'
-        tables = re.findall(table_pattern, query.lower())
+        tables = TABLE_PATTERN.findall(query.lower())
         table_names = [t[0] or t[1] for t in tables]
         
         # Check if any table is explicitly Iceberg-only
@@ -210,7 +327,6 @@ class QueryOrchestrator:
         
         # Estimate data size
         estimated_rows = self._estimate_data_size(query, table_names)
-        metrics.estimated_rows = estimated_rows
         
         # Decision criteria
         use_trino = False
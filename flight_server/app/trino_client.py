@@ -2,21 +2,30 @@
 Trino client for querying Iceberg tables.
 """
 import os
+import queue
 import logging
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, Iterator, List, Optional, Any, Sequence, Tuple
 from dataclasses import dataclass
 from contextlib import contextmanager
 
+import requests
 import trino
 import pandas as pd
+import pyarrow as pa
 from trino.auth import BasicAuthentication
 from trino.exceptions import TrinoException
 
+from query_engine.arrow_fetch import fetch_arrow_table
+
 from .monitoring import trace_operation, monitor_performance
 from .utils import get_iceberg_catalog
 
 logger = logging.getLogger(__name__)
 
+# Idle default-config clients kept open for the short-lived helpers below
+TRINO_POOL_SIZE = 10
+_client_pool: "queue.Queue[TrinoClient]" = queue.Queue(maxsize=TRINO_POOL_SIZE)
+
 
 @dataclass
 class TrinoConfig:
@@ -29,6 +38,8 @@ class TrinoConfig:
     auth: Optional[BasicAuthentication] = None
     source: str = "datahut-duckhouse"
     client_tags: List[str] = None
+    # Optional pooled session shared by every HTTP request to the coordinator
+    http_session: Optional[requests.Session] = None
     
     def __post_init__(self):
         if self.client_tags is None:
@@ -38,6 +49,9 @@ class TrinoConfig:
 class TrinoClient:
     """Enhanced Trino client for Iceberg operations."""
     
+    # Rows pulled per fetchmany() call when building Arrow results
+    FETCH_SIZE = 10_000
+    
     def __init__(self, config: Optional[TrinoConfig] = None):
         """Initialize Trino client with configuration."""
         self.config = config or TrinoConfig()
@@ -48,6 +62,9 @@ class TrinoClient:
     def connection(self) -> trino.dbapi.Connection:
         """Get or create Trino connection."""
         if self._connection is None:
+            connect_kwargs = {}
+            if self.config.http_session is not None:
+                connect_kwargs["http_session"] = self.config.http_session
             self._connection = trino.dbapi.connect(
                 host=self.config.host,
                 port=self.config.port,
@@ -57,7 +74,8 @@ class TrinoClient:
                 auth=self.config.auth,
                 source=self.config.source,
                 client_tags=self.config.client_tags,
-                request_timeout=60
+                request_timeout=60,
+                **connect_kwargs
             )
         return self._connection
     
@@ -71,8 +89,12 @@ class TrinoClient:
             cursor.close()
     
     @monitor_performance
-    def execute_query(self, query: str, parameters: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
-        """Execute a query and return results as DataFrame."""
+    def execute_query(self, query: str, parameters: Optional[Sequence[Any]] = None) -> pd.DataFrame:
+        """Execute a query and return results as DataFrame.
+        
+        ``parameters`` are bound to the ``?`` placeholders: the client sends the
+        statement once as PREPARE and the values through EXECUTE ... USING.
+        """
         with trace_operation("trino_query", {"query": query[:100]}):
             try:
                 with self.cursor() as cursor:
@@ -102,6 +124,31 @@ class TrinoClient:
                 logger.error(f"Unexpected error executing query: {e}")
                 raise
     
+    @monitor_performance
+    def execute_query_arrow(self, query: str, parameters: Optional[Sequence[Any]] = None) -> pa.Table:
+        """Execute a query and return results as an Arrow table, built page by page."""
+        with trace_operation("trino_query_arrow", {"query": query[:100]}):
+            try:
+                with self.cursor() as cursor:
+                    logger.info(f"Executing query: {query[:200]}...")
+                    
+                    if parameters:
+                        cursor.execute(query, parameters)
+                    else:
+                        cursor.execute(query)
+                    
+                    table = fetch_arrow_table(cursor, self.FETCH_SIZE)
+                    logger.info(f"Query executed successfully. Returned {table.num_rows} rows")
+                    
+                    return table
+                    
+            except TrinoException as e:
+                logger.error(f"Trino query failed: {e}")
+                raise
+            except Exception as e:
+                logger.error(f"Unexpected error executing query: {e}")
+                raise
+    
     @monitor_performance
     def list_catalogs(self) -> List[str]:
         """List all available catalogs."""
@@ -312,29 +359,47 @@ def get_trino_client(config: Optional[TrinoConfig] = None) -> TrinoClient:
     return TrinoClient(config)
 
 
+@contextmanager
+def pooled_trino_client() -> Iterator[TrinoClient]:
+    """Borrow a default-config client from the pool, opening one if none is idle.
+    
+    The client goes back to the pool on a clean exit; if the block raised or
+    the pool is full it is closed instead, so a broken connection is never reused.
+    """
+    try:
+        client = _client_pool.get_nowait()
+    except queue.Empty:
+        client = get_trino_client()
+    
+    try:
+        yield client
+    except Exception:
+        client.close()
+        raise
+    
+    try:
+        _client_pool.put_nowait(client)
+    except queue.Full:
+        client.close()
+
+
 # Helper functions for common operations
 def query_iceberg_table(table_name: str, 
                        query: Optional[str] = None, 
                        limit: Optional[int] = None) -> pd.DataFrame:
     """Quick function to query an Iceberg table."""
-    client = get_trino_client()
-    
-    if query is None:
-        query = f"SELECT * FROM {client.config.catalog}.{client.config.schema}.{table_name}"
-        if limit:
-            query += f" LIMIT {limit}"
-    
-    try:
+    with pooled_trino_client() as client:
+        if query is None:
+            query = f"SELECT * FROM {client.config.catalog}.{client.config.schema}.{table_name}"
+            if limit:
+                query += f" LIMIT {limit}"
+        
         return client.execute_query(query)
-    finally:
-        client.close()
 
 
 def get_iceberg_table_info(table_name: str) -> Dict[str, Any]:
     """Get comprehensive information about an Iceberg table."""
-    client = get_trino_client()
-    
-    try:
+    with pooled_trino_client() as client:
         info = {}
         info["description"] = client.describe_table(table_name)
         info["stats"] = client.get_table_stats(table_name)
@@ -346,5 +411,3 @@ def get_iceberg_table_info(table_name: str) -> Dict[str, Any]:
             info["partitions"] = pd.DataFrame()  # Not all tables have partitions
         
         return info
-    finally:
-        client.close()
@@ -0,0 +1,62 @@
+"""
+Arrow conversion for DB-API result sets.
+
+Shared by the Flight server's Trino client and the unified query engine; it
+depends on pyarrow only, so neither side pulls in the other.
+"""
+from typing import Any, Optional
+
+import pyarrow as pa
+
+# Arrow types for Trino column types that map onto one fixed Arrow type
+TRINO_ARROW_TYPES = {
+    "boolean": pa.bool_(),
+    "tinyint": pa.int8(),
+    "smallint": pa.int16(),
+    "integer": pa.int32(),
+    "bigint": pa.int64(),
+    "real": pa.float32(),
+    "double": pa.float64(),
+    "varchar": pa.string(),
+    "char": pa.string(),
+    "json": pa.string(),
+    "varbinary": pa.binary(),
+    "date": pa.date32(),
+}
+
+
+def trino_arrow_type(type_code: Any) -> Optional[pa.DataType]:
+    """Return the Arrow type for a Trino type name such as ``decimal(10,2)``, or None if unmapped."""
+    if not isinstance(type_code, str):
+        return None
+    base, _, args = type_code.partition("(")
+    if base == "decimal":
+        precision, scale = args.rstrip(")").split(",")
+        return pa.decimal128(int(precision), int(scale))
+    if base == "timestamp" and "with time zone" not in type_code:
+        return pa.timestamp("us")
+    return TRINO_ARROW_TYPES.get(base)
+
+
+def fetch_arrow_table(cursor, fetch_size: int) -> pa.Table:
+    """Collect the rows of an executed DB-API cursor into an Arrow table.
+    
+    Rows are pulled ``fetch_size`` at a time and each page becomes one record
+    batch, so no full list of Python rows is ever held. Column types come from
+    the cursor description, so every page (and an empty result) has the same
+    schema; columns without a mapped type are inferred per page and widened to
+    one type when the pages are joined.
+    """
+    tables = []
+    rows = cursor.fetchmany(fetch_size)
+    description = cursor.description or []
+    columns = [desc[0] for desc in description]
+    types = [trino_arrow_type(desc[1]) if len(desc) > 1 else None for desc in description]
+    while rows:
+        arrays = [pa.array(values, type=arrow_type) for values, arrow_type in zip(zip(*rows), types)]
+        tables.append(pa.Table.from_arrays(arrays, names=columns))
+        rows = cursor.fetchmany(fetch_size)
+    
+    if not tables:
+        return pa.Table.from_arrays([pa.array([], type=arrow_type) for arrow_type in types], names=columns)
+    return pa.concat_tables(tables, promote_options="permissive")
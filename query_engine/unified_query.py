@@ -10,17 +10,24 @@ import logging
 import re
 import warnings
 from abc import ABC, abstractmethod
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
 
 import pandas as pd
+import pyarrow as pa
 import duckdb
+import trino
 from sqlalchemy import create_engine, text
 from sqlalchemy.engine import Engine
 
+from query_engine.arrow_fetch import fetch_arrow_table
+
 # Suppress warnings
 warnings.filterwarnings('ignore', category=UserWarning, module='pandas')
 
@@ -31,6 +38,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Keywords scored by UnifiedQueryEngine._calculate_query_complexity
+_COMPLEXITY_KEYWORDS = re.compile(r'\b(JOIN|SELECT|GROUP BY|WITH)\b|\b(OVER)\s*\(')
+
 
 class QueryEngine(Enum):
     """Supported query engines."""
@@ -135,9 +145,6 @@ class SQLDialectTranslator:
         for pattern, replacement in self.duckdb_translations.items():
             translated = re.sub(pattern, replacement, translated, flags=re.IGNORECASE)
         
-        # DuckDB specific optimizations
-        translated = self._add_duckdb_optimizations(translated)
-        
         self.logger.debug(f"Translated to DuckDB: {translated}")
         return translated
     
@@ -147,49 +154,14 @@ class SQLDialectTranslator:
         for pattern, replacement in self.trino_translations.items():
             translated = re.sub(pattern, replacement, translated, flags=re.IGNORECASE)
         
-        # Trino specific optimizations
-        translated = self._add_trino_optimizations(translated)
-        
         self.logger.debug(f"Translated to Trino: {translated}")
         return translated
     
-    def _add_duckdb_optimizations(self, sql: str) -> str:
-        """Add DuckDB-specific optimizations."""
-        # Add PRAGMA optimizations for DuckDB
-        optimizations = []
-        
-        # Check if it's a large join query
-        if re.search(r'\bJOIN\b.*\bJOIN\b', sql, re.IGNORECASE):
-            optimizations.append("PRAGMA enable_optimizer = true;")
-        
-        # Check if it's an aggregation query
-        if re.search(r'\bGROUP BY\b', sql, re.IGNORECASE):
-            optimizations.append("PRAGMA enable_object_cache = true;")
-        
-        if optimizations:
-            return '\n'.join(optimizations) + '\n' + sql
-        return sql
-    
-    def _add_trino_optimizations(self, sql: str) -> str:
-        """Add Trino-specific optimizations."""
-        # Add session properties for Trino
-        optimizations = []
-        
-        # Memory optimization for large queries
-        if len(sql) > 1000:  # Heuristic for complex queries
-            optimizations.append("SET SESSION query_max_memory = '4GB';")
-        
-        # Join optimization
-        if re.search(r'\bJOIN\b', sql, re.IGNORECASE):
-            optimizations.append("SET SESSION join_reordering_strategy = 'AUTOMATIC';")
-        
-        if optimizations:
-            return '\n'.join(optimizations) + '\n' + sql
-        return sql
-    
-    def detect_query_type(self, sql: str) -> QueryType:
-        """Detect the type of SQL query."""
-        sql_upper = sql.strip().upper()
+    def detect_query_type(self, sql: str, sql_upper: Optional[str] = None) -> QueryType:
+        """Detect the type of SQL query, reusing a pre-computed upper-case copy if given."""
+        if sql_upper is None:
+            sql_upper = sql.upper()
+        sql_upper = sql_upper.lstrip()
         
         if sql_upper.startswith('SELECT'):
             return QueryType.SELECT
@@ -209,13 +181,17 @@ class SQLDialectTranslator:
             return QueryType.SELECT  # Default
 
 
+# The translator holds no per-query state, so every executor and engine shares one
+_TRANSLATOR = SQLDialectTranslator()
+
+
 class BaseQueryExecutor(ABC):
     """Abstract base class for query executors."""
     
     def __init__(self, config: QueryConfig):
         self.config = config
         self.logger = logging.getLogger(f"{__name__}.{self.__class__.__name__}")
-        self.translator = SQLDialectTranslator()
+        self.translator = _TRANSLATOR
     
     @abstractmethod
     def connect(self) -> bool:
@@ -223,7 +199,8 @@ class BaseQueryExecutor(ABC):
         pass
     
     @abstractmethod
-    def execute_query(self, sql: str, params: Optional[Dict] = None) -> QueryResult:
+    def execute_query(self, sql: str, params: Optional[Dict] = None,
+                      sql_upper: Optional[str] = None) -> QueryResult:
         """Execute a SQL query."""
         pass
     
@@ -232,6 +209,11 @@ class BaseQueryExecutor(ABC):
         """Get information about a table."""
         pass
     
+    @abstractmethod
+    def _list_tables_fast(self) -> List[str]:
+        """List table names straight from the engine catalog, bypassing execute_query."""
+        pass
+    
     def disconnect(self) -> None:
         """Clean up resources and disconnect."""
         pass
@@ -251,13 +233,15 @@ class DuckDBExecutor(BaseQueryExecutor):
             # Ensure data directory exists
             Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
             
-            # Connect to DuckDB
-            self.connection = duckdb.connect(self.db_path)
+            # Connect to DuckDB, applying global settings while the database opens
+            self.connection = duckdb.connect(self.db_path, config={
+                "memory_limit": f"{self.config.max_memory_mb}MB",
+                "threads": "4",
+                "enable_object_cache": "true",
+            })
             
-            # Configure DuckDB settings
-            self.connection.execute("PRAGMA enable_progress_bar = false;")
-            self.connection.execute(f"PRAGMA memory_limit = '{self.config.max_memory_mb}MB';")
-            self.connection.execute("PRAGMA threads = 4;")
+            # Session-local settings cannot go through config; apply them in one call
+            self.connection.execute("PRAGMA disable_progress_bar; PRAGMA enable_optimizer;")
             
             self.logger.info(f"Connected to DuckDB: {self.db_path}")
             return True
@@ -266,7 +250,8 @@ class DuckDBExecutor(BaseQueryExecutor):
             self.logger.error(f"DuckDB connection failed: {e}")
             return False
     
-    def execute_query(self, sql: str, params: Optional[Dict] = None) -> QueryResult:
+    def execute_query(self, sql: str, params: Optional[Dict] = None,
+                      sql_upper: Optional[str] = None) -> QueryResult:
         """Execute query in DuckDB."""
         if not self.connection:
             raise RuntimeError("DuckDB connection not established")
@@ -277,7 +262,7 @@ class DuckDBExecutor(BaseQueryExecutor):
         try:
             # Translate SQL to DuckDB dialect
             translated_sql = self.translator.translate_to_duckdb(sql)
-            query_type = self.translator.detect_query_type(sql)
+            query_type = self.translator.detect_query_type(sql, sql_upper)
             
             self.logger.debug(f"Executing DuckDB query: {translated_sql}")
             
@@ -326,6 +311,16 @@ class DuckDBExecutor(BaseQueryExecutor):
             self.logger.error(f"Error getting DuckDB table info: {e}")
             raise
     
+    def _list_tables_fast(self) -> List[str]:
+        """List DuckDB tables from information_schema without building a DataFrame."""
+        if not self.connection:
+            raise RuntimeError("DuckDB connection not established")
+        
+        rows = self.connection.execute(
+            "SELECT table_name FROM information_schema.tables WHERE table_schema = 'main'"
+        ).fetchall()
+        return [row[0] for row in rows]
+    
     def disconnect(self) -> None:
         """Close DuckDB connection."""
         if self.connection:
@@ -336,31 +331,56 @@ class DuckDBExecutor(BaseQueryExecutor):
 class TrinoExecutor(BaseQueryExecutor):
     """Query executor for Trino."""
     
+    # Session properties applied to every Trino connection
+    SESSION_PROPERTIES = {
+        "join_reordering_strategy": "AUTOMATIC",
+    }
+    
+    # Statements longer than this are treated as complex and get a larger memory cap
+    LARGE_QUERY_CHARS = 1000
+    LARGE_QUERY_MAX_MEMORY = "4GB"
+    
+    # Rows fetched per round trip when streaming SELECT results
+    FETCH_SIZE = 10_000
+    
     def __init__(self, config: QueryConfig):
         super().__init__(config)
         self.engine: Optional[Engine] = None
+        self.raw_connection: Optional[trino.dbapi.Connection] = None
+        
+        # This would typically be configured from environment or config file
+        self.host = "localhost"  # Configure as needed
+        self.port = 8080
+        self.user = "datahut"
+        self.catalog = "iceberg"
+        self.schema = f"tenant_{config.tenant_id}"
+        
         self.connection_string = self._build_connection_string()
     
     def _build_connection_string(self) -> str:
         """Build Trino connection string."""
-        # This would typically be configured from environment or config file
-        host = "localhost"  # Configure as needed
-        port = 8080
-        catalog = "iceberg"
-        schema = f"tenant_{self.config.tenant_id}"
-        
-        return f"trino://{host}:{port}/{catalog}/{schema}"
+        return f"trino://{self.user}@{self.host}:{self.port}/{self.catalog}/{self.schema}"
     
     def connect(self) -> bool:
         """Establish Trino connection."""
         try:
-            from sqlalchemy import create_engine
-            
+            # Session properties are sent with every request on the pooled connections
             self.engine = create_engine(
                 self.connection_string,
                 pool_pre_ping=True,
                 pool_recycle=3600,
-                echo=False
+                echo=False,
+                connect_args={"session_properties": self.SESSION_PROPERTIES}
+            )
+            
+            # Raw DB-API handle used to stream SELECT results without SQLAlchemy
+            self.raw_connection = trino.dbapi.connect(
+                host=self.host,
+                port=self.port,
+                user=self.user,
+                catalog=self.catalog,
+                schema=self.schema,
+                session_properties=self.SESSION_PROPERTIES
             )
             
             # Test connection
@@ -374,7 +394,8 @@ class TrinoExecutor(BaseQueryExecutor):
             self.logger.error(f"Trino connection failed: {e}")
             return False
     
-    def execute_query(self, sql: str, params: Optional[Dict] = None) -> QueryResult:
+    def execute_query(self, sql: str, params: Optional[Dict] = None,
+                      sql_upper: Optional[str] = None) -> QueryResult:
         """Execute query in Trino."""
         if not self.engine:
             raise RuntimeError("Trino connection not established")
@@ -385,20 +406,29 @@ class TrinoExecutor(BaseQueryExecutor):
         try:
             # Translate SQL to Trino dialect
             translated_sql = self.translator.translate_to_trino(sql)
-            query_type = self.translator.detect_query_type(sql)
+            query_type = self.translator.detect_query_type(sql, sql_upper)
             
             self.logger.debug(f"Executing Trino query: {translated_sql}")
             
-            with self.engine.connect() as conn:
-                if query_type == QueryType.SELECT:
-                    # For SELECT queries, return DataFrame
-                    df = pd.read_sql(text(translated_sql), conn, params=params)
-                    result.data = df
-                    result.rows_affected = len(df)
-                else:
-                    # For other queries, execute and get affected rows
-                    cursor = conn.execute(text(translated_sql), params or {})
-                    result.rows_affected = cursor.rowcount
+            if query_type == QueryType.SELECT and not params:
+                # Stream SELECT results as Arrow batches, bypassing SQLAlchemy
+                with self._large_query_memory(self.raw_connection, translated_sql):
+                    table = self._fetch_arrow(translated_sql)
+                df = table.to_pandas()
+                result.data = df
+                result.rows_affected = len(df)
+            else:
+                with self.engine.connect() as conn, \
+                        self._large_query_memory(conn.connection.dbapi_connection, translated_sql):
+                    if query_type == QueryType.SELECT:
+                        # Named parameters are bound through SQLAlchemy
+                        df = pd.read_sql(text(translated_sql), conn, params=params)
+                        result.data = df
+                        result.rows_affected = len(df)
+                    else:
+                        # For other queries, execute and get affected rows
+                        cursor = conn.execute(text(translated_sql), params or {})
+                        result.rows_affected = cursor.rowcount
             
             result.success = True
             
@@ -413,6 +443,43 @@ class TrinoExecutor(BaseQueryExecutor):
         
         return result
     
+    @contextmanager
+    def _large_query_memory(self, connection: trino.dbapi.Connection, sql: str):
+        """Raise query_max_memory on ``connection`` while a long ``sql`` statement runs.
+        
+        Trino keeps a SET SESSION on the connection it ran on, so the property is
+        reset afterwards and shorter statements keep the cluster default.
+        """
+        if len(sql) <= self.LARGE_QUERY_CHARS:
+            yield
+            return
+        self._run_session_statement(
+            connection, f"SET SESSION query_max_memory = '{self.LARGE_QUERY_MAX_MEMORY}'"
+        )
+        try:
+            yield
+        finally:
+            self._run_session_statement(connection, "RESET SESSION query_max_memory")
+    
+    @staticmethod
+    def _run_session_statement(connection: trino.dbapi.Connection, statement: str) -> None:
+        """Run a SET/RESET SESSION statement to completion so the client records it."""
+        cursor = connection.cursor()
+        try:
+            cursor.execute(statement)
+            cursor.fetchall()
+        finally:
+            cursor.close()
+    
+    def _fetch_arrow(self, sql: str) -> pa.Table:
+        """Run a query on the raw connection and collect the rows as an Arrow table."""
+        cursor = self.raw_connection.cursor()
+        try:
+            cursor.execute(sql)
+            return fetch_arrow_table(cursor, self.FETCH_SIZE)
+        finally:
+            cursor.close()
+    
     def get_table_info(self, table_name: str) -> Dict[str, Any]:
         """Get Trino table information."""
         if not self.engine:
@@ -442,8 +509,19 @@ class TrinoExecutor(BaseQueryExecutor):
             self.logger.error(f"Error getting Trino table info: {e}")
             raise
     
+    def _list_tables_fast(self) -> List[str]:
+        """List Trino tables with SHOW TABLES, fetching plain scalars."""
+        if not self.engine:
+            raise RuntimeError("Trino connection not established")
+        
+        with self.engine.connect() as conn:
+            return list(conn.execute(text("SHOW TABLES")).scalars().all())
+    
     def disconnect(self) -> None:
         """Close Trino connection."""
+        if self.raw_connection:
+            self.raw_connection.close()
+            self.raw_connection = None
         if self.engine:
             self.engine.dispose()
             self.logger.info("Trino connection closed")
@@ -456,7 +534,9 @@ class UnifiedQueryEngine:
         self.tenant_id = tenant_id
         self.logger = logging.getLogger(f"{__name__}.UnifiedQueryEngine")
         self.executors: Dict[QueryEngine, BaseQueryExecutor] = {}
-        self.translator = SQLDialectTranslator()
+        self.translator = _TRANSLATOR
+        # Snapshot of DuckDB table names used for routing, refreshed on DDL
+        self._duckdb_tables: Optional[Set[str]] = None
     
     def add_executor(self, engine: QueryEngine, config: QueryConfig) -> bool:
         """Add a query executor for a specific engine."""
@@ -470,6 +550,8 @@ class UnifiedQueryEngine:
             
             if executor.connect():
                 self.executors[engine] = executor
+                if engine == QueryEngine.DUCKDB:
+                    self._invalidate_duckdb_tables()
                 self.logger.info(f"Added {engine.value} executor")
                 return True
             else:
@@ -480,7 +562,18 @@ class UnifiedQueryEngine:
             self.logger.error(f"Error adding {engine.value} executor: {e}")
             return False
     
-    def _determine_target_engine(self, sql: str, table_hint: Optional[str] = None) -> QueryEngine:
+    def _get_duckdb_tables(self) -> Set[str]:
+        """Return the cached set of DuckDB table names, loading it on first use."""
+        if self._duckdb_tables is None:
+            self._duckdb_tables = set(self.executors[QueryEngine.DUCKDB]._list_tables_fast())
+        return self._duckdb_tables
+    
+    def _invalidate_duckdb_tables(self) -> None:
+        """Drop the cached DuckDB table snapshot so the next lookup reloads it."""
+        self._duckdb_tables = None
+    
+    def _determine_target_engine(self, sql: str, table_hint: Optional[str] = None,
+                                 sql_upper: Optional[str] = None) -> QueryEngine:
         """Determine which engine should execute the query."""
         try:
             # If table hint is provided, use it to determine engine
@@ -488,18 +581,17 @@ class UnifiedQueryEngine:
                 # Check if table exists in DuckDB first
                 if QueryEngine.DUCKDB in self.executors:
                     try:
-                        duckdb_executor = self.executors[QueryEngine.DUCKDB]
-                        duckdb_executor.get_table_info(table_hint)
-                        return QueryEngine.DUCKDB
-                    except Exception:
-                        pass  # Table not in DuckDB
+                        if table_hint in self._get_duckdb_tables():
+                            return QueryEngine.DUCKDB
+                    except Exception as e:
+                        self.logger.warning(f"Could not load DuckDB table list: {e}")
                 
                 # Fall back to Trino
                 if QueryEngine.TRINO in self.executors:
                     return QueryEngine.TRINO
             
             # Analyze query complexity for routing decision
-            complexity_score = self._calculate_query_complexity(sql)
+            complexity_score = self._calculate_query_complexity(sql, sql_upper)
             
             # Route based on complexity
             if complexity_score > 5 and QueryEngine.TRINO in self.executors:
@@ -515,25 +607,32 @@ class UnifiedQueryEngine:
             # Default to DuckDB if available
             return QueryEngine.DUCKDB if QueryEngine.DUCKDB in self.executors else QueryEngine.TRINO
     
-    def _calculate_query_complexity(self, sql: str) -> int:
+    def _calculate_query_complexity(self, sql: str, sql_upper: Optional[str] = None) -> int:
         """Calculate query complexity score for routing decisions."""
         complexity = 0
-        sql_upper = sql.upper()
+        if sql_upper is None:
+            sql_upper = sql.upper()
+        
+        # Tally every scored keyword in a single scan of the statement
+        counts = Counter(
+            match.group(1) or match.group(2)
+            for match in _COMPLEXITY_KEYWORDS.finditer(sql_upper)
+        )
         
         # Join complexity
-        complexity += len(re.findall(r'\bJOIN\b', sql_upper)) * 2
+        complexity += counts['JOIN'] * 2
         
         # Subquery complexity
-        complexity += len(re.findall(r'\bSELECT\b', sql_upper)) - 1
+        complexity += counts['SELECT'] - 1
         
         # Window function complexity
-        complexity += len(re.findall(r'\bOVER\s*\(', sql_upper)) * 2
+        complexity += counts['OVER'] * 2
         
         # Aggregation complexity
-        complexity += len(re.findall(r'\bGROUP BY\b', sql_upper))
+        complexity += counts['GROUP BY']
         
         # CTE complexity
-        complexity += len(re.findall(r'\bWITH\b', sql_upper))
+        complexity += counts['WITH']
         
         return complexity
     
@@ -541,8 +640,11 @@ class UnifiedQueryEngine:
                params: Optional[Dict] = None, table_hint: Optional[str] = None) -> QueryResult:
         """Execute a query using the unified interface."""
         try:
+            # Upper-case once and share it with routing and type detection
+            sql_upper = sql.upper()
+            
             # Determine target engine
-            target_engine = engine or self._determine_target_engine(sql, table_hint)
+            target_engine = engine or self._determine_target_engine(sql, table_hint, sql_upper)
             
             if target_engine not in self.executors:
                 raise RuntimeError(f"No executor available for {target_engine.value}")
@@ -551,7 +653,14 @@ class UnifiedQueryEngine:
             self.logger.info(f"Executing query on {target_engine.value}")
             
             # Execute query
-            result = executor.execute_query(sql, params)
+            result = executor.execute_query(sql, params, sql_upper=sql_upper)
+            
+            # DDL on DuckDB changes the table set used for routing
+            if target_engine == QueryEngine.DUCKDB and self.translator.detect_query_type(sql, sql_upper) in (
+                QueryType.CREATE, QueryType.DROP, QueryType.ALTER
+            ):
+                self._invalidate_duckdb_tables()
+            
             result.metadata['engine'] = target_engine.value
             result.metadata['tenant_id'] = self.tenant_id
             
@@ -579,25 +688,23 @@ class UnifiedQueryEngine:
         tables = []
         
         engines_to_check = [engine] if engine else list(self.executors.keys())
+        engines_to_check = [eng for eng in engines_to_check if eng in self.executors]
+        if not engines_to_check:
+            return tables
+        
+        # Engines are independent, so overlap the Trino round trip with the DuckDB read
+        with ThreadPoolExecutor(max_workers=len(engines_to_check)) as pool:
+            futures = {
+                eng: pool.submit(self.executors[eng]._list_tables_fast)
+                for eng in engines_to_check
+            }
         
-        for eng in engines_to_check:
-            if eng in self.executors:
-                try:
-                    if eng == QueryEngine.DUCKDB:
-                        result = self.executors[eng].execute_query(
-                            "SELECT table_name FROM information_schema.tables WHERE table_schema = 'main'"
-                        )
-                    else:  # Trino
-                        result = self.executors[eng].execute_query(
-                            "SHOW TABLES"
-                        )
-                    
-                    if result.success and result.data is not None:
-                        engine_tables = result.data.iloc[:, 0].tolist()
-                        tables.extend([f"{eng.value}.{table}" for table in engine_tables])
-                        
-                except Exception as e:
-                    self.logger.warning(f"Error listing tables from {eng.value}: {e}")
+        for eng, future in futures.items():
+            try:
+                engine_tables = future.result()
+                tables.extend([f"{eng.value}.{table}" for table in engine_tables])
+            except Exception as e:
+                self.logger.warning(f"Error listing tables from {eng.value}: {e}")
         
         return tables
     
@@ -606,6 +713,7 @@ class UnifiedQueryEngine:
         for executor in self.executors.values():
             executor.disconnect()
         self.executors.clear()
+        self._invalidate_duckdb_tables()
         self.logger.info("All connections closed")
 
 
@@ -1,19 +1,19 @@
 import os
 import argparse
 from pathlib import Path
-from dotenv import load_dotenv
 import boto3
 from pyiceberg.catalog import load_catalog
 import xorq.registry as registry
 from flight_server.app.backends.hybrid_backend import HybridBackend
+from env_config import get_config
 
-# Charger les variables d'environnement
-load_dotenv()
+# Configuration lue une seule fois (.env compris)
+config = get_config()
 
 TRINO_CATALOG_DIR = Path("config/trino/etc/catalog")
-DEFAULT_S3_ENDPOINT = os.getenv("S3_ENDPOINT", "http://minio:9000")
-DEFAULT_ACCESS_KEY = os.getenv("AWS_ACCESS_KEY_ID", "minioadmin")
-DEFAULT_SECRET_KEY = os.getenv("AWS_SECRET_ACCESS_KEY", "minioadmin123")
+DEFAULT_S3_ENDPOINT = config.s3_endpoint
+DEFAULT_ACCESS_KEY = config.aws_access_key
+DEFAULT_SECRET_KEY = config.aws_secret_key
 
 TRINO_CATALOG_TEMPLATE = """connector.name=iceberg
 iceberg.catalog.type=hadoop
@@ -26,6 +26,20 @@ hive.s3.endpoint={s3_endpoint}
 hive.s3.path-style-access=true
 """
 
+# Session et client S3 partagés, créés au premier appel
+_SESSION = None
+_S3_CLIENT = None
+
+def _s3_client():
+    global _SESSION, _S3_CLIENT
+    if _S3_CLIENT is None:
+        _SESSION = boto3.Session(
+            aws_access_key_id=DEFAULT_ACCESS_KEY,
+            aws_secret_access_key=DEFAULT_SECRET_KEY,
+        )
+        _S3_CLIENT = _SESSION.client("s3", endpoint_url=DEFAULT_S3_ENDPOINT)
+    return _S3_CLIENT
+
 def create_catalog_file(tenant_id: str, warehouse: str):
     TRINO_CATALOG_DIR.mkdir(parents=True, exist_ok=True)
     path = TRINO_CATALOG_DIR / f"tenant_{tenant_id}.properties"
@@ -47,7 +61,7 @@ def create_namespace_in_iceberg(tenant_id: str, warehouse: str):
         name="default",
         uri=DEFAULT_S3_ENDPOINT,
         warehouse=f"s3://{warehouse}",
-        s3={"s3fs": boto3.resource("s3")}
+        s3={"s3fs": _s3_client()}
     )
     if tenant_id not in catalog.list_namespaces():
         catalog.create_namespace(tenant_id)
@@ -74,12 +88,7 @@ def register_backend(tenant_id: str, warehouse: str):
 
 def create_minio_bucket_path(warehouse: str):
     bucket_name = warehouse.split("/")[0]
-    s3 = boto3.client(
-        "s3",
-        aws_access_key_id=DEFAULT_ACCESS_KEY,
-        aws_secret_access_key=DEFAULT_SECRET_KEY,
-        endpoint_url=DEFAULT_S3_ENDPOINT,
-    )
+    s3 = _s3_client()
     try:
         s3.head_bucket(Bucket=bucket_name)
         print(f"Bucket '{bucket_name}' déjà existant.")
@@ -1,12 +1,15 @@
 import os
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 from pathlib import Path
 import boto3
-from dotenv import load_dotenv
+from botocore.config import Config
 import xorq.registry as registry
+from env_config import get_config
 
-# Charger les variables d’environnement
-load_dotenv()
+# Configuration lue une seule fois (.env compris)
+config = get_config()
 
 # Répertoires
 TRINO_CATALOG_DIR = Path("config/trino/etc/catalog")
@@ -14,9 +17,9 @@ INGESTION_DIR = Path("ingestion/data")
 SNAPSHOT_ROOT = Path("snapshots")
 
 # Accès S3 / MinIO
-DEFAULT_S3_ENDPOINT = os.getenv("S3_ENDPOINT", "http://minio:9000")
-DEFAULT_ACCESS_KEY = os.getenv("AWS_ACCESS_KEY_ID", "minioadmin")
-DEFAULT_SECRET_KEY = os.getenv("AWS_SECRET_ACCESS_KEY", "minioadmin123")
+DEFAULT_S3_ENDPOINT = config.s3_endpoint
+DEFAULT_ACCESS_KEY = config.aws_access_key
+DEFAULT_SECRET_KEY = config.aws_secret_key
 
 
 def delete_catalog_file(tenant_id: str):
@@ -34,33 +37,92 @@ def unregister_backend(tenant_id: str):
     else:
         print(f"Aucun backend Xorq enregistré sous : {tenant_id}")
 
+# Suppressions de snapshots lancées en parallèle
+UNLINK_WORKERS = 8
+# Fichiers DuckDB et leurs compagnons : journal WAL et fichiers temporaires
+DUCKDB_SUFFIXES = (".duckdb", ".duckdb.wal", ".tmp")
+
 def delete_duckdb_files(tenant_id: str):
     duckdb_file = INGESTION_DIR / f"{tenant_id}.duckdb"
     if duckdb_file.exists():
         duckdb_file.unlink()
         print(f"Fichier DuckDB supprimé : {duckdb_file}")
+    # Un WAL orphelin garderait l'espace disque occupé après la suppression
+    Path(f"{duckdb_file}.wal").unlink(missing_ok=True)
 
     snapshot_path = SNAPSHOT_ROOT / tenant_id
     if snapshot_path.exists():
-        for file in snapshot_path.glob("*.duckdb"):
-            file.unlink()
+        # Un seul readdir : scandir fournit le type de fichier sans stat supplémentaire
+        with os.scandir(snapshot_path) as entries:
+            files = [
+                entry.path for entry in entries
+                if entry.name.endswith(DUCKDB_SUFFIXES) and entry.is_file(follow_symlinks=False)
+            ]
+        with ThreadPoolExecutor(max_workers=UNLINK_WORKERS) as pool:
+            list(pool.map(os.unlink, files))
         snapshot_path.rmdir()
         print(f"Snapshots supprimés : {snapshot_path}")
 
-def delete_minio_bucket(warehouse: str):
-    bucket = warehouse.split("/")[0]
-    s3 = boto3.resource(
+# DeleteObjects accepte au plus 1000 clés par requête
+DELETE_BATCH_SIZE = 1000
+# Requêtes DeleteObjects envoyées en parallèle (le pool HTTP doit suivre)
+DELETE_WORKERS = 16
+S3_MAX_POOL_CONNECTIONS = 50
+
+# Client S3 unique, créé au premier appel : les connexions HTTP restent ouvertes
+# et sont réutilisées par toutes les requêtes DeleteObjects
+@lru_cache(maxsize=1)
+def _s3_client():
+    return boto3.client(
         "s3",
         aws_access_key_id=DEFAULT_ACCESS_KEY,
         aws_secret_access_key=DEFAULT_SECRET_KEY,
         endpoint_url=DEFAULT_S3_ENDPOINT,
+        config=Config(
+            max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+            retries={"max_attempts": 3},
+            tcp_keepalive=True,
+        ),
     )
 
+# Parcourt le bucket par pages et renvoie des lots de clés à supprimer
+def _object_batches(s3, bucket: str):
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, PaginationConfig={"PageSize": DELETE_BATCH_SIZE}):
+        keys = [{"Key": obj["Key"]} for obj in page.get("Contents", [])]
+        if keys:
+            yield keys
+
+# Buckets versionnés : lots d'anciennes versions et de delete markers
+def _version_batches(s3, bucket: str):
+    paginator = s3.get_paginator("list_object_versions")
+    for page in paginator.paginate(Bucket=bucket, PaginationConfig={"PageSize": DELETE_BATCH_SIZE}):
+        versions = [
+            {"Key": v["Key"], "VersionId": v["VersionId"]}
+            for v in page.get("Versions", []) + page.get("DeleteMarkers", [])
+        ]
+        for i in range(0, len(versions), DELETE_BATCH_SIZE):
+            yield versions[i:i + DELETE_BATCH_SIZE]
+
+# Mode Quiet : la réponse ne contient que les clés en erreur, pas un accusé par clé
+def _delete_batch(s3, bucket: str, objects):
+    response = s3.delete_objects(Bucket=bucket, Delete={"Objects": objects, "Quiet": True})
+    errors = response.get("Errors", [])
+    if errors:
+        raise RuntimeError(f"{len(errors)} objet(s) non supprimé(s), ex: {errors[0].get('Key')}")
+
+def delete_minio_bucket(warehouse: str):
+    bucket = warehouse.split("/")[0]
+    s3 = _s3_client()
+    delete_batch = partial(_delete_batch, s3, bucket)
+
     try:
-        bucket_obj = s3.Bucket(bucket)
-        for obj in bucket_obj.objects.all():
-            obj.delete()
-        bucket_obj.delete()
+        # Les versions sont listées une fois les objets courants supprimés,
+        # pour récupérer aussi les delete markers créés par la première passe
+        with ThreadPoolExecutor(max_workers=DELETE_WORKERS) as pool:
+            list(pool.map(delete_batch, _object_batches(s3, bucket)))
+            list(pool.map(delete_batch, _version_batches(s3, bucket)))
+        s3.delete_bucket(Bucket=bucket)
         print(f"Bucket supprimé sur MinIO : {bucket}")
     except Exception as e:
         print(f"Échec suppression bucket ou déjà supprimé : {bucket} ({e})")
@@ -76,10 +138,17 @@ def main():
 
     print(f"\nSuppression du tenant : {tenant_id}\n")
 
-    delete_catalog_file(tenant_id)
-    unregister_backend(tenant_id)
-    delete_duckdb_files(tenant_id)
-    delete_minio_bucket(warehouse)
+    # Les quatre étapes touchent des ressources indépendantes
+    # (catalogue Trino, registre Xorq, fichiers locaux, MinIO) : on les lance ensemble
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [
+            pool.submit(delete_catalog_file, tenant_id),
+            pool.submit(unregister_backend, tenant_id),
+            pool.submit(delete_duckdb_files, tenant_id),
+            pool.submit(delete_minio_bucket, warehouse),
+        ]
+        for future in futures:
+            future.result()
 
     print(f"\nTenant '{tenant_id}' supprimé avec succès.")
 
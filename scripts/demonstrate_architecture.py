@@ -89,26 +89,38 @@ def demonstrate_trino_queries():
             print("  No Iceberg tables found. Run 'make setup-iceberg' first.")
             return
         
-        # Example distributed queries
-        queries = [
-            ("Total patients", "SELECT COUNT(*) as total_patients FROM iceberg.default.patient_data"),
-            ("Disease distribution", "SELECT disease, COUNT(*) as count FROM iceberg.default.patient_data GROUP BY disease ORDER BY count DESC"),
-            ("Recent data", "SELECT disease, COUNT(*) as count FROM iceberg.default.patient_data WHERE recorded_at >= CURRENT_DATE - INTERVAL '7' DAY GROUP BY disease"),
-        ]
+        # Total, per-disease and last-7-days counts computed in one scan:
+        # the empty grouping set gives the total, (disease) the distribution
+        query = """
+            SELECT
+                CASE WHEN GROUPING(disease) = 1 THEN 'total' ELSE disease END AS disease_group,
+                COUNT(*) AS count,
+                COUNT_IF(recorded_at >= CURRENT_DATE - INTERVAL '7' DAY) AS recent_count
+            FROM iceberg.default.patient_data
+            GROUP BY GROUPING SETS ((), (disease))
+            ORDER BY GROUPING(disease) DESC, COUNT(*) DESC
+        """
         
-        for description, query in queries:
-            try:
-                start_time = time.time()
-                result = client.execute_query(query)
-                end_time = time.time()
-                
-                print(f"\\n📊 {description}:")
-                print(result.head(10))  # Show first 10 rows
-                print(f"⏱️  Query time: {(end_time - start_time)*1000:.2f}ms")
-                print(f"📈 Rows returned: {len(result)}")
-                
-            except Exception as e:
-                print(f"  ❌ Query failed: {e}")
+        try:
+            start_time = time.time()
+            result = client.execute_query_arrow(query).to_pandas()
+            end_time = time.time()
+            
+            total = result.iloc[0]
+            diseases = result.iloc[1:]
+            recent = diseases[diseases["recent_count"] > 0]
+            
+            print("\\n📊 Total patients:")
+            print(f"  {total['count']}")
+            print("\\n📊 Disease distribution:")
+            print(diseases[["disease_group", "count"]].head(10).to_string(index=False))
+            print("\\n📊 Recent data:")
+            print(recent[["disease_group", "recent_count"]].head(10).to_string(index=False))
+            print(f"⏱️  Query time: {(end_time - start_time)*1000:.2f}ms")
+            print(f"📈 Rows returned: {len(result)}")
+            
+        except Exception as e:
+            print(f"  ❌ Query failed: {e}")
         
         client.close()
         
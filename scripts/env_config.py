@@ -0,0 +1,60 @@
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+import pyarrow as pa
+from dotenv import load_dotenv
+
+
+# Taille des blocs CSV lus puis envoyés un par un au serveur Flight
+CSV_BLOCK_SIZE = 64 << 20
+# Schéma connu du CSV : évite la passe d'inférence de types d'Arrow
+CSV_SCHEMA = pa.schema([
+    ("Disease", pa.string()),
+    ("Fever", pa.string()),
+    ("Cough", pa.string()),
+    ("Fatigue", pa.string()),
+    ("Difficulty Breathing", pa.string()),
+    ("Age", pa.int64()),
+    ("Gender", pa.string()),
+    ("Blood Pressure", pa.string()),
+    ("Cholesterol Level", pa.string()),
+    ("Outcome Variable", pa.string()),
+])
+# Options du canal gRPC : gros messages autorisés et keepalive entre deux envois
+FLIGHT_GRPC_OPTIONS = [
+    ("grpc.max_send_message_length", 512 << 20),
+    ("grpc.keepalive_time_ms", 30_000),
+]
+
+
+@dataclass(frozen=True, slots=True)
+class Config:
+    flight_host: str
+    flight_port: int
+    csv_path: str
+    csv_glob: str
+    table_name: str
+    flight_target: str
+    duckdb_path: str
+    s3_endpoint: str
+    aws_access_key: str
+    aws_secret_key: str
+
+
+# Le fichier .env est lu une seule fois par processus, quel que soit le nombre de scripts importés
+@lru_cache(maxsize=1)
+def get_config() -> Config:
+    load_dotenv()
+    csv_path = os.getenv("CSV_PATH", "ingestion/data/data.csv")
+    return Config(
+        flight_host=os.getenv("FLIGHT_SERVER_HOST", "localhost"),
+        flight_port=int(os.getenv("FLIGHT_SERVER_PORT", "8815")),
+        csv_path=csv_path,
+        csv_glob=os.getenv("CSV_GLOB", csv_path),
+        table_name=os.getenv("FLIGHT_TABLE_NAME", "diseases"),
+        flight_target=os.getenv("FLIGHT_TARGET", "duckdb"),
+        duckdb_path=os.getenv("DUCKDB_PATH", "ingestion/data/duckhouse.duckdb"),
+        s3_endpoint=os.getenv("S3_ENDPOINT", "http://minio:9000"),
+        aws_access_key=os.getenv("AWS_ACCESS_KEY_ID", "minioadmin"),
+        aws_secret_key=os.getenv("AWS_SECRET_ACCESS_KEY", "minioadmin123"),
+    )
@@ -1,38 +1,57 @@
-import os
-from dotenv import load_dotenv
+import glob
+from itertools import chain
+import pyarrow as pa
 import pyarrow.csv as csv
 from xorq.flight.client import FlightClient
-
-# Charger les variables d'environnement
-load_dotenv()
-
-# Configuration
-FLIGHT_SERVER_HOST = os.getenv("FLIGHT_SERVER_HOST", "localhost")
-FLIGHT_SERVER_PORT = os.getenv("FLIGHT_SERVER_PORT", "8815")
-CSV_PATH = os.getenv("CSV_PATH", "ingestion/data/data.csv")
-TABLE_NAME = os.getenv("FLIGHT_TABLE_NAME", "diseases")
-FLIGHT_TARGET = os.getenv("FLIGHT_TARGET", "duckdb")
+from env_config import CSV_BLOCK_SIZE, CSV_SCHEMA, FLIGHT_GRPC_OPTIONS, get_config
+
+# Configuration lue une seule fois (.env compris)
+config = get_config()
+FLIGHT_SERVER_HOST = config.flight_host
+FLIGHT_SERVER_PORT = config.flight_port
+CSV_PATH = config.csv_path
+# Motif de fichiers CSV à envoyer dans la même table (par défaut : CSV_PATH seul)
+CSV_GLOB = config.csv_glob
+TABLE_NAME = config.table_name
+FLIGHT_TARGET = config.flight_target
+
+def open_csv(path):
+    print(f"Lecture en flux du fichier CSV : {path}")
+    return csv.open_csv(
+        path,
+        read_options=csv.ReadOptions(block_size=CSV_BLOCK_SIZE, use_threads=True),
+        convert_options=csv.ConvertOptions(
+            column_types={field.name: field.type for field in CSV_SCHEMA}
+        ),
+    )
 
 def main():
     endpoint = f"grpc://{FLIGHT_SERVER_HOST}:{FLIGHT_SERVER_PORT}"
     print(f"Connexion au serveur Xorq Arrow Flight : {endpoint}")
-    client = FlightClient(endpoint)
+    client = FlightClient(
+        host=FLIGHT_SERVER_HOST,
+        port=FLIGHT_SERVER_PORT,
+        generic_options=FLIGHT_GRPC_OPTIONS
+    )
 
-    # Lecture du fichier CSV
-    if not os.path.exists(CSV_PATH):
-        print(f"Fichier CSV introuvable : {CSV_PATH}")
+    # Lecture des fichiers CSV
+    csv_paths = sorted(glob.glob(CSV_GLOB))
+    if not csv_paths:
+        print(f"Fichier CSV introuvable : {CSV_GLOB}")
         return
 
-    print(f"Chargement du fichier CSV : {CSV_PATH}")
-    with open(CSV_PATH, "rb") as f:
-        table = csv.read_csv(f)
+    # Tous les fichiers partagent CSV_SCHEMA : un seul flux do_put pour l'ensemble
+    reader = pa.RecordBatchReader.from_batches(
+        CSV_SCHEMA,
+        chain.from_iterable(open_csv(path) for path in csv_paths)
+    )
 
-    print(f"{table.num_rows} lignes lues. Envoi vers backend : {FLIGHT_TARGET.upper()}")
+    print(f"Envoi par lots de {len(csv_paths)} fichier(s) vers backend : {FLIGHT_TARGET.upper()}")
 
-    # Envoi via client Xorq
-    client.upload_data(
-        key=TABLE_NAME,
-        data=table,
+    # Envoi via client Xorq : chaque lot est transmis dès qu'il est parsé
+    client.upload_batches(
+        TABLE_NAME,
+        reader,
         target=FLIGHT_TARGET
     )
 
@@ -1,57 +1,114 @@
 import os
-import pyarrow as pa
 import pyarrow.csv as csv
 import pyarrow.flight as flight
+import pyarrow.parquet as pq
 import duckdb
-import subprocess
-from dotenv import load_dotenv
-
-# Charger les variables d'environnement depuis .env
-load_dotenv()
-
-# Paramètres de configuration
-FLIGHT_SERVER_HOST = os.getenv("FLIGHT_SERVER_HOST", "localhost")
-FLIGHT_SERVER_PORT = os.getenv("FLIGHT_SERVER_PORT", "8815")
-TABLE_NAME = os.getenv("FLIGHT_TABLE_NAME", "diseases")
-CSV_PATH = os.getenv("CSV_PATH", "ingestion/data/data.csv")
-FLIGHT_TARGET = os.getenv("FLIGHT_TARGET", "duckdb")
-DUCKDB_PATH = os.getenv("DUCKDB_PATH", "ingestion/data/duckhouse.duckdb")
+from dbt.cli.main import dbtRunner
+from env_config import CSV_BLOCK_SIZE, CSV_SCHEMA, FLIGHT_GRPC_OPTIONS, get_config
+
+# Paramètres de configuration, lus une seule fois (.env compris)
+config = get_config()
+FLIGHT_SERVER_HOST = config.flight_host
+FLIGHT_SERVER_PORT = config.flight_port
+TABLE_NAME = config.table_name
+CSV_PATH = config.csv_path
+FLIGHT_TARGET = config.flight_target
+DUCKDB_PATH = config.duckdb_path
 DBT_PROJECT_PATH = "transform/dbt_project"
 DBT_PROFILES_DIR = f"{DBT_PROJECT_PATH}/config"
+# Copie Parquet du CSV, générée une fois puis relue à chaque exécution
+PARQUET_PATH = os.path.splitext(CSV_PATH)[0] + ".parquet"
+PARQUET_ROW_GROUP_SIZE = 256_000
 
-def ingest_data():
-    print("Étape 1 : Envoi des données au serveur Arrow Flight...")
-    client = flight.FlightClient(f"grpc://{FLIGHT_SERVER_HOST}:{FLIGHT_SERVER_PORT}")
+_flight_client = None
+
+def get_flight_client():
+    # Un seul canal gRPC par processus, réutilisé par tous les envois
+    global _flight_client
+    if _flight_client is None:
+        _flight_client = flight.FlightClient(
+            f"grpc://{FLIGHT_SERVER_HOST}:{FLIGHT_SERVER_PORT}",
+            generic_options=FLIGHT_GRPC_OPTIONS
+        )
+    return _flight_client
+
+def open_csv():
+    # Lecture en flux : les blocs sont parsés au fur et à mesure
+    return csv.open_csv(
+        CSV_PATH,
+        read_options=csv.ReadOptions(block_size=CSV_BLOCK_SIZE, use_threads=True),
+        convert_options=csv.ConvertOptions(
+            column_types={field.name: field.type for field in CSV_SCHEMA}
+        ),
+    )
+
+def convert_csv_to_parquet():
+    # La conversion n'est refaite que si le CSV est plus récent que le Parquet
+    if os.path.exists(PARQUET_PATH) and os.path.getmtime(PARQUET_PATH) >= os.path.getmtime(CSV_PATH):
+        return
+
+    print(f"Conversion du CSV en Parquet : {PARQUET_PATH}")
+    reader = open_csv()
+    tmp_path = f"{PARQUET_PATH}.tmp"
+    with pq.ParquetWriter(tmp_path, reader.schema, compression="zstd") as writer:
+        for batch in reader:
+            writer.write_batch(batch, row_group_size=PARQUET_ROW_GROUP_SIZE)
+    # Remplacement atomique : un Parquet incomplet n'est jamais relu
+    os.replace(tmp_path, PARQUET_PATH)
+
+def ingest_into_duckdb():
+    print(f"Étape 1 : Chargement direct du Parquet dans DuckDB ({DUCKDB_PATH})...")
+    conn = duckdb.connect(DUCKDB_PATH)
+    try:
+        conn.execute(
+            f'CREATE OR REPLACE TABLE "{TABLE_NAME}" AS '
+            "SELECT * FROM read_parquet(?)",
+            [PARQUET_PATH]
+        )
+        num_rows = conn.execute(f'SELECT COUNT(*) FROM "{TABLE_NAME}"').fetchone()[0]
+    finally:
+        conn.close()
+    print(f"Données chargées dans '{TABLE_NAME}' ({num_rows} lignes) dans DUCKDB")
 
+def ingest_data():
     if not os.path.exists(CSV_PATH):
         raise FileNotFoundError(f"Fichier CSV introuvable : {CSV_PATH}")
 
-    with open(CSV_PATH, "rb") as f:
-        table = csv.read_csv(f)
+    convert_csv_to_parquet()
+
+    # Cible DuckDB locale : DuckDB lit le Parquet nativement, inutile de passer par Flight
+    if FLIGHT_TARGET.lower() == "duckdb":
+        ingest_into_duckdb()
+        return
+
+    print("Étape 1 : Envoi des données au serveur Arrow Flight...")
+    client = get_flight_client()
+
+    # Lecture en flux : chaque groupe de lignes est envoyé sans attendre la fin du fichier
+    parquet_file = pq.ParquetFile(PARQUET_PATH)
 
     descriptor = flight.FlightDescriptor.for_path(TABLE_NAME)
     options = flight.FlightCallOptions(headers=[("target", FLIGHT_TARGET)])
 
-    writer, _ = client.do_put(descriptor, table.schema, options=options)
-    writer.write_table(table)
+    writer, _ = client.do_put(descriptor, parquet_file.schema_arrow, options=options)
+    num_rows = 0
+    for batch in parquet_file.iter_batches():
+        writer.write_batch(batch)
+        num_rows += batch.num_rows
     writer.done_writing()
-    print(f"Données envoyées vers '{TABLE_NAME}' ({table.num_rows} lignes) dans {FLIGHT_TARGET.upper()}")
+    print(f"Données envoyées vers '{TABLE_NAME}' ({num_rows} lignes) dans {FLIGHT_TARGET.upper()}")
 
 def run_dbt():
     print("Étape 2 : Exécution des transformations dbt...")
-    result = subprocess.run(
-        [
-            "poetry", "run", "dbt", "run",
-            "--project-dir", DBT_PROJECT_PATH,
-            "--profiles-dir", DBT_PROFILES_DIR
-        ],
-        capture_output=True,
-        text=True
-    )
-    if result.returncode != 0:
+    # dbt tourne dans le processus courant : pas de démarrage d'interpréteur à chaque appel
+    result = dbtRunner().invoke([
+        "run",
+        "--project-dir", DBT_PROJECT_PATH,
+        "--profiles-dir", DBT_PROFILES_DIR
+    ])
+    if not result.success:
         print("Erreur dans dbt run :")
-        print(result.stdout)
-        print(result.stderr)
+        print(result.exception or result.result)
         raise RuntimeError("dbt run failed")
     print("dbt run exécuté avec succès")
 
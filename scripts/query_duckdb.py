@@ -1,12 +1,15 @@
 import duckdb
 import os
-from dotenv import load_dotenv
+from env_config import get_config
 
-# Charger les variables d'environnement
-load_dotenv()
+# Obtenir le chemin vers la base DuckDB (configuration lue une seule fois)
+DUCKDB_PATH = get_config().duckdb_path
 
-# Obtenir le chemin vers la base DuckDB
-DUCKDB_PATH = os.getenv("DUCKDB_PATH", "ingestion/data/duckhouse.duckdb")
+# Requêtes paramétrées : les valeurs sont liées, jamais concaténées au SQL
+SHOW_TABLES = "SHOW TABLES"
+LIMIT_REV = "SELECT * FROM rev LIMIT ?"
+COUNT_REV = "SELECT COUNT(*) FROM rev"
+PREVIEW_ROWS = 5
 
 def main():
     if not os.path.exists(DUCKDB_PATH):
@@ -19,14 +22,14 @@ def main():
 
     # Liste des tables disponibles
     print("\nTables dans la base :")
-    result = conn.execute("SHOW TABLES").fetchall()
+    result = conn.execute(SHOW_TABLES).fetchall()
     for table in result:
         print(f" - {table[0]}")
 
     # Affichage des premières lignes de la table "rev"
     print("\nAperçu de la table 'rev' :")
     try:
-        df = conn.execute("SELECT * FROM rev LIMIT 5").fetchdf()
+        df = conn.execute(LIMIT_REV, [PREVIEW_ROWS]).fetchdf()
         print(df)
     except Exception as e:
         print(f"Erreur lors de la lecture de 'rev' : {e}")
@@ -34,7 +37,7 @@ def main():
     # Exemple de requête analytique
     print("\n Total de lignes dans 'rev' :")
     try:
-        total = conn.execute("SELECT COUNT(*) FROM rev").fetchone()[0]
+        total = conn.execute(COUNT_REV).fetchone()[0]
         print(f"Total de lignes : {total}")
     except Exception as e:
         print(f"Erreur dans la requête : {e}")
@@ -95,9 +95,9 @@ def main():
             print(f"\\n=== Executing Query ===")
             print(f"Query: {args.query}")
             
-            df = client.execute_query(args.query)
-            print(f"\\nResults ({len(df)} rows):")
-            print(df.head(args.limit))
+            table = client.execute_query_arrow(args.query)
+            print(f"\\nResults ({table.num_rows} rows):")
+            print(table.slice(0, args.limit).to_pandas())
             
         elif args.table:
             # Query specific table
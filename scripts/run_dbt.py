@@ -3,15 +3,27 @@
 Run dbt to transform and test the analytics stack.
 """
 import sys
-import subprocess
 
+from dbt.cli.main import dbtRunner
 
-def run_dbt_command(command, description):
-    """Run a dbt command and capture the output."""
+DBT_ARGS = ["--profiles-dir", "config", "--project-dir", "."]
+
+
+def make_runner():
+    """Parse the project once and return a runner that reuses the manifest."""
+    result = dbtRunner().invoke(["parse", *DBT_ARGS])
+    if not result.success:
+        print(f"❌ DBT Parse - FAILED: {result.exception}")
+        sys.exit(1)
+    return dbtRunner(manifest=result.result)
+
+
+def run_dbt_command(runner, command, description):
+    """Run a dbt command in-process with the shared runner."""
     print(f"Running: {description}")
     try:
-        result = subprocess.run(command, shell=True)
-        if result.returncode == 0:
+        result = runner.invoke([command, *DBT_ARGS])
+        if result.success:
             print(f"✅ {description} - SUCCESS")
         else:
             print(f"❌ {description} - FAILED")
@@ -24,15 +36,12 @@ def run_dbt_command(command, description):
 def main():
     """Main function to run dbt transformations."""
     print("🔄 Running dbt transformations...")
+    runner = make_runner()
 
-    # Run dbt seed
-    run_dbt_command("dbt seed --profiles-dir config --project-dir .", "DBT Seed")
-
-    # Run dbt run
-    run_dbt_command("dbt run --profiles-dir config --project-dir .", "DBT Run")
-
-    # Run dbt test
-    run_dbt_command("dbt test --profiles-dir config --project-dir .", "DBT Test")
+    # Seed, run and test as one DAG: dbt schedules each node as soon as its
+    # parents are done, so models that do not depend on seeds build while
+    # seeds load, and tests start as soon as their model exists
+    run_dbt_command(runner, "build", "DBT Build (seed + run + test)")
 
     print("🎉 All dbt tasks completed successfully!")
 
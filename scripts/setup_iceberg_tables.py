@@ -4,11 +4,17 @@ Setup Iceberg tables through Trino for the analytics stack.
 """
 import os
 import sys
+import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import pandas as pd
-from datetime import datetime, timedelta
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from datetime import datetime
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Add the project root to the path
 sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -21,52 +27,88 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def create_sample_data():
-    """Create sample data for Iceberg tables."""
-    np.random.seed(42)
+def create_sample_data(num_patients: int = 100) -> pa.Table:
+    """Create sample data for Iceberg tables as flat Arrow columns.
+    
+    The symptoms and demographics fields are kept as one column each
+    (``symptoms_*``, ``demographics_*``); Trino assembles them into JSON
+    objects on insert, so no per-patient dict is ever built.
+    """
+    rng = np.random.default_rng(42)
     
     # Sample patient data
     diseases = ['COVID-19', 'Influenza', 'Pneumonia', 'Bronchitis', 'Asthma']
-    patients = []
     
-    for i in range(100):
-        patient = {
-            'patient_id': f'P{i:04d}',
-            'disease': np.random.choice(diseases),
-            'symptoms': {
-                'fever': np.random.choice([True, False]),
-                'cough': np.random.choice([True, False]),
-                'fatigue': np.random.choice([True, False]),
-                'breathing_difficulty': np.random.choice([True, False])
-            },
-            'demographics': {
-                'age': np.random.randint(18, 80),
-                'gender': np.random.choice(['Male', 'Female']),
-                'location': np.random.choice(['Urban', 'Rural'])
-            },
-            'outcome': np.random.choice(['Positive', 'Negative']),
-            'recorded_at': datetime.now() - timedelta(days=np.random.randint(0, 30))
-        }
-        patients.append(patient)
+    # Zero-padded IDs (P0000, P0001, ...) built as one string array
+    patient_ids = np.char.add('P', np.char.zfill(np.arange(num_patients).astype(str), 4))
+    
+    # Clock read once; offsets are whole days subtracted in one array operation
+    now = np.datetime64(datetime.now(), 's')
+    recorded_at = now - rng.integers(0, 30, num_patients).astype('timedelta64[D]')
     
-    return patients
+    return pa.table({
+        'patient_id': patient_ids,
+        'disease': rng.choice(diseases, num_patients),
+        'symptoms_fever': rng.integers(0, 2, num_patients, dtype=bool),
+        'symptoms_cough': rng.integers(0, 2, num_patients, dtype=bool),
+        'symptoms_fatigue': rng.integers(0, 2, num_patients, dtype=bool),
+        'symptoms_breathing_difficulty': rng.integers(0, 2, num_patients, dtype=bool),
+        'demographics_age': rng.integers(18, 80, num_patients),
+        'demographics_gender': rng.choice(['Male', 'Female'], num_patients),
+        'demographics_location': rng.choice(['Urban', 'Rural'], num_patients),
+        'outcome': rng.choice(['Positive', 'Negative'], num_patients),
+        'recorded_at': recorded_at
+    })
+
+
+def aggregate_patient_batch(batch: pa.Table) -> pa.Table:
+    """Aggregate a batch of patient rows per disease and day for patient_analytics."""
+    grouped = pa.table({
+        'disease': batch['disease'],
+        'recorded_date': pc.floor_temporal(batch['recorded_at'], unit='day'),
+        'positive': pc.cast(pc.equal(batch['outcome'], 'Positive'), pa.int64()),
+        'age': batch['demographics_age']
+    }).group_by(['disease', 'recorded_date']).aggregate([
+        ('disease', 'count'),
+        ('positive', 'sum'),
+        ('age', 'sum')
+    ])
+    return pa.table({
+        'disease': grouped['disease'],
+        'recorded_date': pc.strftime(grouped['recorded_date'], format='%Y-%m-%d %H:%M:%S'),
+        'case_count': grouped['disease_count'],
+        'positive_count': grouped['positive_sum'],
+        'age_total': grouped['age_sum']
+    })
+
+
+def create_http_session() -> requests.Session:
+    """Create a keep-alive session whose pooled connections are reused across statements."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=16,
+        max_retries=Retry(total=3, backoff_factor=0.3)
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
 
 
 def setup_iceberg_tables():
     """Set up Iceberg tables in Trino."""
+    http_session = create_http_session()
     config = TrinoConfig(
         host=os.getenv("TRINO_HOST", "localhost"),
         port=int(os.getenv("TRINO_PORT", "8080")),
         catalog="iceberg",
-        schema="default"
+        schema="default",
+        http_session=http_session
     )
     
     client = get_trino_client(config)
     
     try:
-        # Create patient_data table
-        logger.info("Creating patient_data table...")
-        
         create_table_query = """
             CREATE TABLE IF NOT EXISTS iceberg.default.patient_data (
                 patient_id VARCHAR,
@@ -83,18 +125,9 @@ def setup_iceberg_tables():
             )
         """
         
-        try:
-            client.execute_query(create_table_query)
-            logger.info("✅ patient_data table created successfully")
-        except Exception as e:
-            logger.warning(f"Table creation failed (might already exist): {e}")
-        
-        # Create historical trends table
-        logger.info("Creating disease_trends table...")
+        create_schema_query = "CREATE SCHEMA IF NOT EXISTS iceberg.historical"
         
         create_trends_query = """
-            CREATE SCHEMA IF NOT EXISTS iceberg.historical;
-            
             CREATE TABLE IF NOT EXISTS iceberg.historical.disease_trends (
                 date DATE,
                 disease_type VARCHAR,
@@ -108,75 +141,184 @@ def setup_iceberg_tables():
             )
         """
         
-        try:
-            client.execute_query(create_trends_query)
-            logger.info("✅ disease_trends table created successfully")
-        except Exception as e:
-            logger.warning(f"Trends table creation failed: {e}")
+        # Summary table kept up to date by MERGE after each insert: running totals
+        # are stored so rates can be updated without rescanning patient_data
+        drop_mv_query = "DROP MATERIALIZED VIEW IF EXISTS iceberg.default.patient_analytics"
+        
+        create_analytics_query = """
+            CREATE TABLE IF NOT EXISTS iceberg.default.patient_analytics (
+                disease VARCHAR,
+                recorded_date TIMESTAMP,
+                total_cases BIGINT,
+                positive_cases BIGINT,
+                age_total BIGINT,
+                positivity_rate DOUBLE,
+                avg_age DOUBLE
+            )
+            WITH (
+                format = 'PARQUET',
+                partitioning = ARRAY['month(recorded_date)']
+            )
+        """
+        
+        def create_patient_table():
+            logger.info("Creating patient_data table...")
+            try:
+                client.execute_query(create_table_query)
+                logger.info("✅ patient_data table created successfully")
+            except Exception as e:
+                logger.warning(f"Table creation failed (might already exist): {e}")
+        
+        def create_trends_table():
+            # The schema must exist before its table: these two stay sequential
+            logger.info("Creating disease_trends table...")
+            try:
+                client.execute_query(create_schema_query)
+                client.execute_query(create_trends_query)
+                logger.info("✅ disease_trends table created successfully")
+            except Exception as e:
+                logger.warning(f"Trends table creation failed: {e}")
+        
+        def create_analytics_table():
+            # Replaces the former hourly-refreshed materialized view of the same name
+            logger.info("Creating patient_analytics summary table...")
+            try:
+                client.execute_query(drop_mv_query)
+            except Exception as e:
+                logger.warning(f"Could not drop legacy materialized view: {e}")
+            try:
+                client.execute_query(create_analytics_query)
+                logger.info("✅ patient_analytics table created successfully")
+            except Exception as e:
+                logger.warning(f"Analytics table creation failed: {e}")
+        
+        # The tables are independent: create them concurrently. Open the
+        # connection first so all threads share it.
+        client.connection
+        tasks = [create_patient_table, create_trends_table, create_analytics_table]
+        with ThreadPoolExecutor(max_workers=len(tasks)) as pool:
+            for future in [pool.submit(task) for task in tasks]:
+                future.result()
         
         # Insert sample data
         logger.info("Inserting sample data...")
         
         sample_data = create_sample_data()
         
-        # Insert data in batches
-        for i in range(0, len(sample_data), 10):
-            batch = sample_data[i:i+10]
-            
-            values = []
-            for patient in batch:
-                values.append(f"""
-                    ('{patient['patient_id']}', 
-                     '{patient['disease']}', 
-                     JSON '{patient['symptoms']}', 
-                     JSON '{patient['demographics']}', 
-                     '{patient['outcome']}', 
-                     TIMESTAMP '{patient['recorded_at'].strftime('%Y-%m-%d %H:%M:%S')}')
-                """)
-            
-            insert_query = f"""
-                INSERT INTO iceberg.default.patient_data 
-                (patient_id, disease, symptoms, demographics, outcome, recorded_at)
-                VALUES {', '.join(values)}
-            """
-            
-            try:
-                client.execute_query(insert_query)
-                logger.info(f"✅ Inserted batch {i//10 + 1}")
-            except Exception as e:
-                logger.error(f"Failed to insert batch {i//10 + 1}: {e}")
-        
-        # Create materialized view for quick analytics
-        logger.info("Creating analytics materialized view...")
-        
-        mv_query = """
-            CREATE OR REPLACE MATERIALIZED VIEW iceberg.default.patient_analytics
-            WITH (refresh_interval = '1h')
-            AS
-            SELECT 
-                disease,
-                COUNT(*) as total_cases,
-                AVG(CASE WHEN outcome = 'Positive' THEN 1.0 ELSE 0.0 END) as positivity_rate,
-                AVG(CAST(JSON_EXTRACT_SCALAR(demographics, '$.age') AS INTEGER)) as avg_age,
-                DATE_TRUNC('day', recorded_at) as recorded_date
-            FROM iceberg.default.patient_data
-            WHERE recorded_at >= CURRENT_DATE - INTERVAL '30' DAY
-            GROUP BY disease, DATE_TRUNC('day', recorded_at)
+        # Insert all rows in one prepared statement: the sample data travels as a
+        # single bound JSON object of column arrays that Trino unnests into rows,
+        # so no value is ever formatted into the SQL text
+        columns = sample_data.set_column(
+            sample_data.schema.get_field_index('recorded_at'),
+            'recorded_at',
+            pc.strftime(sample_data['recorded_at'], format='%Y-%m-%d %H:%M:%S')
+        )
+        payload = json.dumps(columns.to_pydict())
+        
+        insert_query = """
+            INSERT INTO iceberg.default.patient_data 
+            (patient_id, disease, symptoms, demographics, outcome, recorded_at)
+            WITH batch AS (
+                SELECT CAST(json_parse(?) AS ROW(
+                    patient_id ARRAY(VARCHAR),
+                    disease ARRAY(VARCHAR),
+                    symptoms_fever ARRAY(BOOLEAN),
+                    symptoms_cough ARRAY(BOOLEAN),
+                    symptoms_fatigue ARRAY(BOOLEAN),
+                    symptoms_breathing_difficulty ARRAY(BOOLEAN),
+                    demographics_age ARRAY(INTEGER),
+                    demographics_gender ARRAY(VARCHAR),
+                    demographics_location ARRAY(VARCHAR),
+                    outcome ARRAY(VARCHAR),
+                    recorded_at ARRAY(VARCHAR)
+                )) AS cols
+            )
+            SELECT
+                t.patient_id,
+                t.disease,
+                CAST(CAST(ROW(t.fever, t.cough, t.fatigue, t.breathing_difficulty) AS ROW(
+                    fever BOOLEAN, cough BOOLEAN, fatigue BOOLEAN, breathing_difficulty BOOLEAN
+                )) AS JSON),
+                CAST(CAST(ROW(t.age, t.gender, t.location) AS ROW(
+                    age INTEGER, gender VARCHAR, location VARCHAR
+                )) AS JSON),
+                t.outcome,
+                CAST(t.recorded_at AS TIMESTAMP)
+            FROM batch
+            CROSS JOIN UNNEST(
+                cols.patient_id, cols.disease,
+                cols.symptoms_fever, cols.symptoms_cough, cols.symptoms_fatigue,
+                cols.symptoms_breathing_difficulty,
+                cols.demographics_age, cols.demographics_gender, cols.demographics_location,
+                cols.outcome, cols.recorded_at
+            ) AS t(
+                patient_id, disease, fever, cough, fatigue, breathing_difficulty,
+                age, gender, location, outcome, recorded_at
+            )
+        """
+        
+        # Fold only the new batch into patient_analytics: the MERGE touches the
+        # (disease, day) groups present in this batch instead of re-aggregating
+        # the whole table
+        merge_query = """
+            MERGE INTO iceberg.default.patient_analytics AS a
+            USING (
+                SELECT
+                    u.disease,
+                    CAST(u.recorded_date AS TIMESTAMP) AS recorded_date,
+                    u.case_count,
+                    u.positive_count,
+                    u.age_total
+                FROM (
+                    SELECT CAST(json_parse(?) AS ROW(
+                        disease ARRAY(VARCHAR),
+                        recorded_date ARRAY(VARCHAR),
+                        case_count ARRAY(BIGINT),
+                        positive_count ARRAY(BIGINT),
+                        age_total ARRAY(BIGINT)
+                    )) AS cols
+                ) AS batch
+                CROSS JOIN UNNEST(
+                    cols.disease, cols.recorded_date, cols.case_count,
+                    cols.positive_count, cols.age_total
+                ) AS u(disease, recorded_date, case_count, positive_count, age_total)
+            ) AS s
+            ON a.disease = s.disease AND a.recorded_date = s.recorded_date
+            WHEN MATCHED THEN UPDATE SET
+                total_cases = a.total_cases + s.case_count,
+                positive_cases = a.positive_cases + s.positive_count,
+                age_total = a.age_total + s.age_total,
+                positivity_rate = CAST(a.positive_cases + s.positive_count AS DOUBLE) / (a.total_cases + s.case_count),
+                avg_age = CAST(a.age_total + s.age_total AS DOUBLE) / (a.total_cases + s.case_count)
+            WHEN NOT MATCHED THEN INSERT
+                (disease, recorded_date, total_cases, positive_cases, age_total, positivity_rate, avg_age)
+            VALUES (
+                s.disease,
+                s.recorded_date,
+                s.case_count,
+                s.positive_count,
+                s.age_total,
+                CAST(s.positive_count AS DOUBLE) / s.case_count,
+                CAST(s.age_total AS DOUBLE) / s.case_count
+            )
         """
         
         try:
-            client.execute_query(mv_query)
-            logger.info("✅ Analytics materialized view created successfully")
+            client.execute_query(insert_query, [payload])
+            logger.info(f"✅ Inserted {sample_data.num_rows} rows")
+            
+            logger.info("Updating patient_analytics...")
+            analytics = aggregate_patient_batch(sample_data)
+            client.execute_query(merge_query, [json.dumps(analytics.to_pydict())])
+            logger.info(f"✅ Merged {analytics.num_rows} disease/day groups into patient_analytics")
         except Exception as e:
-            logger.warning(f"Materialized view creation failed: {e}")
+            logger.error(f"Failed to insert sample data: {e}")
         
         # Test queries
         logger.info("Running test queries...")
         
         # Test 1: Count records
         count_query = "SELECT COUNT(*) as total_records FROM iceberg.default.patient_data"
-        result = client.execute_query(count_query)
-        logger.info(f"Total records in patient_data: {result.iloc[0]['total_records']}")
         
         # Test 2: Disease distribution
         disease_query = """
@@ -185,16 +327,27 @@ def setup_iceberg_tables():
             GROUP BY disease 
             ORDER BY count DESC
         """
-        result = client.execute_query(disease_query)
-        logger.info("Disease distribution:")
-        print(result)
         
         # Test 3: Table statistics
         stats_query = "SHOW STATS FOR iceberg.default.patient_data"
+        
+        # The three read-only queries are independent: submit them together
+        # over the shared connection instead of waiting on each in turn
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            count_future = pool.submit(client.execute_query, count_query)
+            disease_future = pool.submit(client.execute_query, disease_query)
+            stats_future = pool.submit(client.execute_query, stats_query)
+        
+        result = count_future.result()
+        logger.info(f"Total records in patient_data: {result.iloc[0]['total_records']}")
+        
+        # Lazy %-formatting: the tables are only rendered when INFO is enabled
+        result = disease_future.result()
+        logger.info("Disease distribution:\n%s", result)
+        
         try:
-            result = client.execute_query(stats_query)
-            logger.info("Table statistics:")
-            print(result)
+            result = stats_future.result()
+            logger.info("Table statistics:\n%s", result)
         except Exception as e:
             logger.warning(f"Could not get table statistics: {e}")
         
@@ -206,6 +359,7 @@ def setup_iceberg_tables():
     
     finally:
         client.close()
+        http_session.close()
 
 
 def main():
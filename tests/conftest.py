@@ -2,20 +2,31 @@
 Pytest configuration and fixtures for DataHut-DuckHouse tests.
 """
 import os
+import sys
 import tempfile
 from pathlib import Path
 from typing import Generator
 
 import pytest
 import duckdb
-import pandas as pd
-from unittest.mock import Mock, patch
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import trino.dbapi
+from unittest.mock import Mock, MagicMock, patch
+
+# Heavy module the tests patch by dotted path; importing it here pays its
+# import cost during collection rather than inside the first test's duration
+import s3fs  # noqa: F401
+
+
+# RAM-backed tmpfs on Linux keeps CSV writes and DuckDB files off the disk
+TMPFS_DIR = "/dev/shm" if sys.platform == "linux" and Path("/dev/shm").is_dir() else None
 
 
 @pytest.fixture(scope="session")
 def temp_dir() -> Generator[Path, None, None]:
     """Create a temporary directory for test files."""
-    with tempfile.TemporaryDirectory() as tmp_dir:
+    with tempfile.TemporaryDirectory(dir=TMPFS_DIR) as tmp_dir:
         yield Path(tmp_dir)
 
 
@@ -25,22 +36,22 @@ def test_duckdb_path(temp_dir: Path) -> str:
     return str(temp_dir / "test.duckdb")
 
 
-@pytest.fixture
-def sample_data() -> pd.DataFrame:
-    """Create sample data for testing."""
-    return pd.DataFrame({
-        'id': [1, 2, 3, 4, 5],
-        'name': ['Alice', 'Bob', 'Charlie', 'David', 'Eve'],
-        'age': [25, 30, 35, 28, 32],
-        'city': ['New York', 'London', 'Paris', 'Tokyo', 'Sydney']
+@pytest.fixture(scope="session")
+def sample_data() -> pa.Table:
+    """Create sample data for testing, built once per session."""
+    return pa.table({
+        'id': pa.array([1, 2, 3, 4, 5], pa.int32()),
+        'name': pa.array(['Alice', 'Bob', 'Charlie', 'David', 'Eve'], pa.string()),
+        'age': pa.array([25, 30, 35, 28, 32], pa.int32()),
+        'city': pa.array(['New York', 'London', 'Paris', 'Tokyo', 'Sydney'], pa.string())
     })
 
 
-@pytest.fixture
-def sample_csv_path(temp_dir: Path, sample_data: pd.DataFrame) -> str:
-    """Create a sample CSV file for testing."""
+@pytest.fixture(scope="session")
+def sample_csv_path(temp_dir: Path, sample_data: pa.Table) -> str:
+    """Create a sample CSV file for testing, written once per session."""
     csv_path = temp_dir / "sample.csv"
-    sample_data.to_csv(csv_path, index=False)
+    pacsv.write_csv(sample_data, csv_path)
     return str(csv_path)
 
 
@@ -70,16 +81,64 @@ def mock_s3_client():
         yield mock_s3
 
 
+@pytest.fixture(scope="session")
+def xorq_flight_client():
+    """Import the installed xorq Flight client once, skipping if it cannot be resolved.
+    
+    The repo's top-level ``xorq/`` directory can shadow the installed package,
+    so the import is kept out of module scope where it would break collection.
+    """
+    return pytest.importorskip("xorq.flight.client")
+
+
 @pytest.fixture
-def mock_flight_client():
+def mock_flight_client(xorq_flight_client):
     """Mock Arrow Flight client for testing."""
     with patch('xorq.flight.client.FlightClient') as mock_client:
         yield mock_client
 
 
 @pytest.fixture
-def duckdb_connection(test_duckdb_path: str) -> Generator[duckdb.DuckDBPyConnection, None, None]:
-    """Create a DuckDB connection for testing."""
-    conn = duckdb.connect(test_duckdb_path)
+def trino_mocks(monkeypatch):
+    """Replace the trino module and tracing used by TrinoClient; return the (cursor, connection) mocks."""
+    cursor = MagicMock(spec=trino.dbapi.Cursor)
+    connection = MagicMock(spec=trino.dbapi.Connection)
+    connection.cursor.return_value = cursor
+    fake_trino = MagicMock()
+    fake_trino.dbapi.connect.return_value = connection
+    monkeypatch.setattr('flight_server.app.trino_client.trino', fake_trino)
+    monkeypatch.setattr('flight_server.app.trino_client.trace_operation', MagicMock())
+    return cursor, connection
+
+
+@pytest.fixture
+def trino_result(trino_mocks):
+    """Return a helper that loads a result set into the mocked Trino cursor.
+    
+    ``trino_result(columns, rows)`` sets the cursor description (``None`` when
+    there are no columns) and fetchall() rows, and returns the cursor.
+    """
+    cursor, _ = trino_mocks
+    
+    def load(columns, rows):
+        cursor.description = [[column] for column in columns] or None
+        cursor.fetchall.return_value = rows
+        return cursor
+    
+    return load
+
+
+@pytest.fixture(scope="session")
+def duckdb_connection() -> Generator[duckdb.DuckDBPyConnection, None, None]:
+    """Create one in-memory DuckDB connection shared by the test session."""
+    conn = duckdb.connect(":memory:")
     yield conn
     conn.close()
+
+
+@pytest.fixture
+def duckdb_cursor(duckdb_connection: duckdb.DuckDBPyConnection) -> Generator[duckdb.DuckDBPyConnection, None, None]:
+    """Create a per-test cursor on the shared in-memory connection."""
+    cursor = duckdb_connection.cursor()
+    yield cursor
+    cursor.close()
@@ -3,18 +3,35 @@ Tests for flight_server.app.backends.hybrid_backend module.
 """
 import os
 import pytest
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import DEFAULT, Mock, patch, MagicMock
 from pathlib import Path
 
 from flight_server.app.backends.hybrid_backend import HybridBackend
 
 
+@pytest.fixture
+def backend():
+    """HybridBackend with DuckDB, view reflection and snapshots mocked out."""
+    backend = HybridBackend()
+    backend.duckdb_con = Mock()
+    backend._reflect_views = Mock()
+    backend._create_snapshot = Mock()
+    return backend
+
+
+@pytest.fixture
+def mock_parent(monkeypatch):
+    """Patch xorq and the PyIceberg parent backend; return the parent mock."""
+    parent = Mock()
+    monkeypatch.setattr('flight_server.app.backends.hybrid_backend.xo', Mock())
+    monkeypatch.setattr('flight_server.app.backends.hybrid_backend.PyIcebergBackend', parent)
+    return parent
+
+
 class TestHybridBackend:
     """Test HybridBackend class."""
 
-    @patch('flight_server.app.backends.hybrid_backend.xo')
-    @patch('flight_server.app.backends.hybrid_backend.PyIcebergBackend')
-    def test_init_with_warehouse_path(self, mock_parent, mock_xo):
+    def test_init_with_warehouse_path(self, mock_parent):
         """Test HybridBackend initialization with warehouse path."""
         warehouse_path = "s3://test-warehouse/"
         
@@ -29,9 +46,7 @@ class TestHybridBackend:
         assert backend.duckdb_path is None
         assert backend.snapshot_dir is None
 
-    @patch('flight_server.app.backends.hybrid_backend.xo')
-    @patch('flight_server.app.backends.hybrid_backend.PyIcebergBackend')
-    def test_init_without_warehouse_path(self, mock_parent, mock_xo):
+    def test_init_without_warehouse_path(self, mock_parent):
         """Test HybridBackend initialization without warehouse path."""
         mock_parent.__init__ = Mock(return_value=None)
         
@@ -41,68 +56,74 @@ class TestHybridBackend:
         assert backend.duckdb_path is None
         assert backend.snapshot_dir is None
 
-    @patch('flight_server.app.backends.hybrid_backend.shutil')
-    @patch('flight_server.app.backends.hybrid_backend.Path')
-    @patch('flight_server.app.backends.hybrid_backend.xo')
-    def test_do_connect(self, mock_xo, mock_path, mock_shutil):
+    def test_do_connect(self, mocker):
         """Test do_connect method."""
+        mocks = mocker.patch.multiple(
+            'flight_server.app.backends.hybrid_backend',
+            shutil=DEFAULT, Path=DEFAULT, xo=DEFAULT
+        )
+        
         # Setup mocks
         mock_path_instance = Mock()
         mock_path_instance.absolute.return_value = mock_path_instance
         mock_path_instance.mkdir = Mock()
-        mock_path.return_value = mock_path_instance
+        mocks['Path'].return_value = mock_path_instance
         
         mock_connection = Mock()
-        mock_xo.duckdb.connect.return_value = mock_connection
+        mocks['xo'].duckdb.connect.return_value = mock_connection
         
         # Create backend instance
         backend = HybridBackend()
         backend.do_connect = Mock(wraps=backend.do_connect)
         
         # Mock parent methods
-        with patch.object(backend, '_setup_duckdb_connection'), \
-             patch.object(backend, '_reflect_views'), \
-             patch.object(backend, '_create_snapshot'), \
-             patch('flight_server.app.backends.hybrid_backend.PyIcebergBackend.do_connect'):
-            
-            # Call do_connect
-            backend.do_connect(
-                warehouse_path="s3://test-warehouse/",
-                duckdb_path="/custom/path.duckdb",
-                snapshot_dir="/custom/snapshots",
-                namespace="test",
-                catalog_name="test_catalog"
-            )
-            
-            # Verify setup
-            assert backend.duckdb_path == "/custom/path.duckdb"
-            mock_path_instance.mkdir.assert_called_once_with(parents=True, exist_ok=True)
-            mock_xo.duckdb.connect.assert_called_once_with("/custom/path.duckdb")
-
-    def test_create_table_duckdb(self):
-        """Test create_table method with duckdb target."""
-        backend = HybridBackend()
-        backend.duckdb_con = Mock()
-        backend._reflect_views = Mock()
-        backend._create_snapshot = Mock()
-        
-        # Test successful creation
-        backend.duckdb_con.create_table.return_value = True
-        
-        result = backend.create_table("test_table", "test_data", target="duckdb")
+        mocker.patch.multiple(
+            backend,
+            _setup_duckdb_connection=DEFAULT, _reflect_views=DEFAULT, _create_snapshot=DEFAULT
+        )
+        mocker.patch('flight_server.app.backends.hybrid_backend.PyIcebergBackend.do_connect')
+        
+        # Call do_connect
+        backend.do_connect(
+            warehouse_path="s3://test-warehouse/",
+            duckdb_path="/custom/path.duckdb",
+            snapshot_dir="/custom/snapshots",
+            namespace="test",
+            catalog_name="test_catalog"
+        )
         
-        backend.duckdb_con.create_table.assert_called_once_with("test_table", "test_data")
+        # Verify setup
+        assert backend.duckdb_path == "/custom/path.duckdb"
+        mock_path_instance.mkdir.assert_called_once_with(parents=True, exist_ok=True)
+        mocks['xo'].duckdb.connect.assert_called_once_with("/custom/path.duckdb")
+
+    @pytest.mark.parametrize("method, target, kwargs", [
+        ("create_table", "duckdb", {}),
+        ("create_table", "iceberg", {}),
+        ("insert", "duckdb", {"mode": "append"}),
+        ("insert", "iceberg", {"mode": "append"}),
+    ])
+    def test_write_routes_to_target(self, backend, method, target, kwargs):
+        """Test create_table/insert route to DuckDB or Iceberg, then refresh views and snapshot."""
+        getattr(backend.duckdb_con, method).return_value = True
+        
+        with patch(f'flight_server.app.backends.hybrid_backend.PyIcebergBackend.{method}') as mock_parent:
+            mock_parent.return_value = True
+            
+            result = getattr(backend, method)("test_table", "test_data", target=target, **kwargs)
+        
+        if target == "iceberg":
+            mock_parent.assert_called_once_with("test_table", "test_data", **kwargs)
+            getattr(backend.duckdb_con, method).assert_not_called()
+        else:
+            getattr(backend.duckdb_con, method).assert_called_once_with("test_table", "test_data")
+            mock_parent.assert_not_called()
         backend._reflect_views.assert_called_once()
         backend._create_snapshot.assert_called_once()
         assert result is True
 
-    def test_create_table_duckdb_fallback_to_insert(self):
+    def test_create_table_duckdb_fallback_to_insert(self, backend):
         """Test create_table method with duckdb target falling back to insert."""
-        backend = HybridBackend()
-        backend.duckdb_con = Mock()
-        backend._reflect_views = Mock()
-        backend._create_snapshot = Mock()
-        
         # Test fallback to insert
         backend.duckdb_con.create_table.side_effect = Exception("Table exists")
         backend.duckdb_con.insert.return_value = True
@@ -113,67 +134,11 @@ class TestHybridBackend:
         backend.duckdb_con.insert.assert_called_once_with("test_table", "test_data")
         assert result is True
 
-    def test_create_table_iceberg(self):
-        """Test create_table method with iceberg target."""
-        backend = HybridBackend()
-        backend._reflect_views = Mock()
-        backend._create_snapshot = Mock()
-        
-        with patch('flight_server.app.backends.hybrid_backend.PyIcebergBackend.create_table') as mock_parent:
-            mock_parent.return_value = True
-            
-            result = backend.create_table("test_table", "test_data", target="iceberg")
-            
-            mock_parent.assert_called_once_with("test_table", "test_data")
-            backend._reflect_views.assert_called_once()
-            backend._create_snapshot.assert_called_once()
-            assert result is True
-
-    def test_create_table_invalid_target(self):
-        """Test create_table method with invalid target."""
-        backend = HybridBackend()
-        
-        with pytest.raises(ValueError, match="Le paramètre 'target' doit être 'duckdb' ou 'iceberg'"):
-            backend.create_table("test_table", "test_data", target="invalid")
-
-    def test_insert_duckdb(self):
-        """Test insert method with duckdb target."""
-        backend = HybridBackend()
-        backend.duckdb_con = Mock()
-        backend._reflect_views = Mock()
-        backend._create_snapshot = Mock()
-        
-        backend.duckdb_con.insert.return_value = True
-        
-        result = backend.insert("test_table", "test_data", target="duckdb")
-        
-        backend.duckdb_con.insert.assert_called_once_with("test_table", "test_data")
-        backend._reflect_views.assert_called_once()
-        backend._create_snapshot.assert_called_once()
-        assert result is True
-
-    def test_insert_iceberg(self):
-        """Test insert method with iceberg target."""
-        backend = HybridBackend()
-        backend._reflect_views = Mock()
-        backend._create_snapshot = Mock()
-        
-        with patch('flight_server.app.backends.hybrid_backend.PyIcebergBackend.insert') as mock_parent:
-            mock_parent.return_value = True
-            
-            result = backend.insert("test_table", "test_data", target="iceberg", mode="append")
-            
-            mock_parent.assert_called_once_with("test_table", "test_data", mode="append")
-            backend._reflect_views.assert_called_once()
-            backend._create_snapshot.assert_called_once()
-            assert result is True
-
-    def test_insert_invalid_target(self):
-        """Test insert method with invalid target."""
-        backend = HybridBackend()
-        
+    @pytest.mark.parametrize("method", ["create_table", "insert"])
+    def test_write_invalid_target(self, backend, method):
+        """Test create_table/insert with an invalid target."""
         with pytest.raises(ValueError, match="Le paramètre 'target' doit être 'duckdb' ou 'iceberg'"):
-            backend.insert("test_table", "test_data", target="invalid")
+            getattr(backend, method)("test_table", "test_data", target="invalid")
 
     def test_reflect_views(self):
         """Test _reflect_views method."""
@@ -191,27 +156,15 @@ class TestHybridBackend:
         
         backend._reflect_views()
         
-        # Verify SQL commands were executed
-        expected_calls = [
-            f"""
-                CREATE OR REPLACE VIEW table1 AS
-                SELECT * FROM iceberg_scan(
-                    's3://test-warehouse/test_namespace.db/table1',
-                    version='?',
-                    allow_moved_paths=true
-                );
-            """,
-            f"""
-                CREATE OR REPLACE VIEW "table-with-dash" AS
-                SELECT * FROM iceberg_scan(
-                    's3://test-warehouse/test_namespace.db/table-with-dash',
-                    version='?',
-                    allow_moved_paths=true
-                );
-            """
-        ]
-        
-        assert backend.duckdb_con.raw_sql.call_count == 2
+        # Verify all views are created in a single batch
+        backend.duckdb_con.raw_sql.assert_called_once_with(
+            "CREATE OR REPLACE VIEW table1 AS "
+            "SELECT * FROM iceberg_scan('s3://test-warehouse//test_namespace.db/table1', "
+            "version='?', allow_moved_paths=true);\n"
+            "CREATE OR REPLACE VIEW \"table-with-dash\" AS "
+            "SELECT * FROM iceberg_scan('s3://test-warehouse//test_namespace.db/table-with-dash', "
+            "version='?', allow_moved_paths=true);"
+        )
 
     def test_setup_duckdb_connection(self):
         """Test _setup_duckdb_connection method."""
@@ -229,10 +182,10 @@ class TestHybridBackend:
         for cmd in expected_commands:
             backend.duckdb_con.raw_sql.assert_any_call(cmd)
 
-    @patch('flight_server.app.backends.hybrid_backend.shutil')
-    @patch('flight_server.app.backends.hybrid_backend.datetime')
-    def test_create_snapshot(self, mock_datetime, mock_shutil):
+    def test_create_snapshot(self, mocker):
         """Test _create_snapshot method."""
+        mock_datetime = mocker.patch('flight_server.app.backends.hybrid_backend.datetime')
+        mock_shutil = mocker.patch('flight_server.app.backends.hybrid_backend.shutil')
         backend = HybridBackend()
         backend.duckdb_con = Mock()
         backend.duckdb_path = "/test/path.duckdb"
@@ -245,18 +198,15 @@ class TestHybridBackend:
         
         backend._create_snapshot()
         
-        # Verify snapshot table creation
-        expected_calls = [
-            "CREATE OR REPLACE TABLE table1_snapshot AS SELECT * FROM table1;",
-            "CREATE OR REPLACE TABLE table2_snapshot AS SELECT * FROM table2;",
-            "CHECKPOINT '/test/path.duckdb';",
-        ]
-        
-        for cmd in expected_calls:
-            backend.duckdb_con.raw_sql.assert_any_call(cmd)
+        # Verify snapshot tables and checkpoint are sent as one batch
+        backend.duckdb_con.raw_sql.assert_called_once_with(
+            "CREATE OR REPLACE TABLE table1_snapshot AS SELECT * FROM table1;\n"
+            "CREATE OR REPLACE TABLE table2_snapshot AS SELECT * FROM table2;\n"
+            "CHECKPOINT '/test/path.duckdb';"
+        )
         
         # Verify file copy
-        mock_shutil.copy.assert_called_once_with(
+        mock_shutil.copyfile.assert_called_once_with(
             "/test/path.duckdb",
             "/test/snapshots/20231225_120000.duckdb"
         )
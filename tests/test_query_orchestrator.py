@@ -2,25 +2,84 @@
 Tests for the query orchestrator.
 """
 import pytest
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import Mock, patch, MagicMock, sentinel
+import duckdb
 import pandas as pd
+import sqlglot
 
 from flight_server.app.query_orchestrator import (
     QueryOrchestrator, 
     QueryMetrics, 
     QueryType, 
     DataSource,
-    get_query_orchestrator
+    get_query_orchestrator,
+    normalize_query,
+    query_fingerprint
 )
+from flight_server.app.trino_client import TrinoClient
 
+# Result frames shared by the tests below; they are only ever read
+ROW_COUNT_STATS_DF = pd.DataFrame({'Column Name': [''], 'Row Count': [1000000]})
+COUNT_DF = pd.DataFrame({'count': [1000]})
+FORCED_DF = pd.DataFrame({'result': ['forced']})
+DESCRIPTION_DF = pd.DataFrame({'column': ['id', 'name']})
+STATS_DF = pd.DataFrame({'stat': ['rows', 'size']})
+HISTORY_DF = pd.DataFrame({'timestamp': ['2023-01-01']})
 
+
+class FakeCursor:
+    """Minimal DuckDB connection stand-in: each execute() serves the next canned result."""
+    
+    def __init__(self, results):
+        self._results = iter(results)
+        self._last = None
+        self.description = None
+    
+    def execute(self, sql):
+        self._last = next(self._results)
+        return self
+    
+    def fetchall(self):
+        return self._last
+    
+    def fetchone(self):
+        return self._last
+
+
+@pytest.fixture(scope="module")
+def shared_orchestrator():
+    """Build one QueryOrchestrator for the whole module."""
+    return QueryOrchestrator()
+
+
+@pytest.fixture
+def orchestrator(shared_orchestrator, monkeypatch):
+    """Shared orchestrator with its connections, size estimates and routes reset for each test."""
+    monkeypatch.setattr(shared_orchestrator, "trino_client", None)
+    monkeypatch.setattr(shared_orchestrator, "duckdb_connection", None)
+    yield shared_orchestrator
+    shared_orchestrator._estimate_table_rows.cache_clear()
+    shared_orchestrator._route_decision.cache_clear()
+
+
+@pytest.fixture
+def patched_backends(monkeypatch):
+    """Replace both backend factories; return the (trino_client, duckdb_connection) mocks."""
+    trino = MagicMock(spec=TrinoClient)
+    duck = MagicMock(spec=duckdb.DuckDBPyConnection)
+    monkeypatch.setattr('flight_server.app.query_orchestrator.get_trino_client', lambda: trino)
+    monkeypatch.setattr('flight_server.app.query_orchestrator.get_duckdb_connection', lambda: duck)
+    return trino, duck
+
+
+@pytest.mark.fast
+@pytest.mark.no_cover
 class TestQueryMetrics:
     """Test QueryMetrics dataclass."""
     
     def test_default_values(self):
         """Test default values."""
         metrics = QueryMetrics()
-        assert metrics.estimated_rows == 0
         assert metrics.table_count == 0
         assert metrics.has_joins is False
         assert metrics.has_aggregations is False
@@ -32,10 +91,8 @@ class TestQueryMetrics:
 class TestQueryOrchestrator:
     """Test QueryOrchestrator functionality."""
     
-    def test_init(self):
+    def test_init(self, orchestrator):
         """Test orchestrator initialization."""
-        orchestrator = QueryOrchestrator()
-        
         assert orchestrator.row_threshold == 1_000_000
         assert orchestrator.complexity_threshold == 5.0
         assert orchestrator.join_threshold == 3
@@ -47,63 +104,37 @@ class TestQueryOrchestrator:
         assert "patient_data" in orchestrator.table_registry
         assert orchestrator.table_registry["patient_data"] == DataSource.ICEBERG
     
-    def test_analyze_query_simple(self):
-        """Test query analysis for simple queries."""
-        orchestrator = QueryOrchestrator()
-        
-        query = "SELECT * FROM local_patients"
-        metrics = orchestrator._analyze_query(query)
-        
-        assert metrics.table_count == 1
-        assert metrics.has_joins is False
-        assert metrics.has_aggregations is False
-        assert metrics.has_subqueries is False
-        assert metrics.query_type == QueryType.SIMPLE_SELECT
-        assert metrics.complexity_score == 1.0  # 1 table * 1.0
-    
-    def test_analyze_query_with_joins(self):
-        """Test query analysis with joins."""
-        orchestrator = QueryOrchestrator()
-        
-        query = "SELECT * FROM patients p JOIN diseases d ON p.disease_id = d.id"
-        metrics = orchestrator._analyze_query(query)
-        
-        assert metrics.table_count == 2
-        assert metrics.has_joins is True
-        assert metrics.has_aggregations is False
-        assert metrics.query_type == QueryType.JOIN
-        assert metrics.complexity_score == 4.0  # 2 tables + 2 for joins
-    
-    def test_analyze_query_with_aggregations(self):
-        """Test query analysis with aggregations."""
-        orchestrator = QueryOrchestrator()
-        
-        query = "SELECT disease, COUNT(*) FROM patients GROUP BY disease"
-        metrics = orchestrator._analyze_query(query)
-        
-        assert metrics.table_count == 1
-        assert metrics.has_joins is False
-        assert metrics.has_aggregations is True
-        assert metrics.query_type == QueryType.AGGREGATION
-        assert metrics.complexity_score == 2.5  # 1 table + 1.5 for aggregations
-    
-    def test_analyze_query_analytical(self):
-        """Test query analysis for analytical queries."""
-        orchestrator = QueryOrchestrator()
-        
-        query = "SELECT disease, COUNT(*), AVG(age) FROM patients p JOIN outcomes o ON p.id = o.patient_id GROUP BY disease"
+    @pytest.mark.parametrize("query, expected", [
+        # Simple: 1 table * 1.0
+        ("SELECT * FROM local_patients", dict(
+            table_count=1, has_joins=False, has_aggregations=False, has_subqueries=False,
+            query_type=QueryType.SIMPLE_SELECT, complexity_score=1.0
+        )),
+        # Joins: 2 tables + 2 for joins
+        ("SELECT * FROM patients p JOIN diseases d ON p.disease_id = d.id", dict(
+            table_count=2, has_joins=True, has_aggregations=False,
+            query_type=QueryType.JOIN, complexity_score=4.0
+        )),
+        # Aggregations: 1 table + 1.5 for aggregations
+        ("SELECT disease, COUNT(*) FROM patients GROUP BY disease", dict(
+            table_count=1, has_joins=False, has_aggregations=True,
+            query_type=QueryType.AGGREGATION, complexity_score=2.5
+        )),
+        # Analytical: 2 tables + 2 joins + 1.5 aggregations
+        ("SELECT disease, COUNT(*), AVG(age) FROM patients p JOIN outcomes o ON p.id = o.patient_id GROUP BY disease", dict(
+            table_count=2, has_joins=True, has_aggregations=True,
+            query_type=QueryType.ANALYTICAL, complexity_score=5.5
+        )),
+    ], ids=["simple", "with_joins", "with_aggregations", "analytical"])
+    def test_analyze_query(self, orchestrator, query, expected):
+        """Test query analysis for simple, join, aggregation and analytical queries."""
         metrics = orchestrator._analyze_query(query)
         
-        assert metrics.table_count == 2
-        assert metrics.has_joins is True
-        assert metrics.has_aggregations is True
-        assert metrics.query_type == QueryType.ANALYTICAL
-        assert metrics.complexity_score == 5.5  # 2 tables + 2 joins + 1.5 aggregations
+        for field, value in expected.items():
+            assert getattr(metrics, field) == value, field
     
-    def test_analyze_query_complex(self):
+    def test_analyze_query_complex(self, orchestrator):
         """Test query analysis for complex queries."""
-        orchestrator = QueryOrchestrator()
-        
         query = """
         SELECT disease, 
                COUNT(*) OVER (PARTITION BY disease) as disease_count,
@@ -116,57 +147,68 @@ class TestQueryOrchestrator:
         assert metrics.has_subqueries is True
         assert metrics.complexity_score > 3.0  # Should be classified as complex
     
+    def test_analyze_query_untokenizable(self, orchestrator):
+        """Test that SQL sqlglot cannot tokenize falls back to pattern analysis."""
+        query = "select * from patients where name = 'unterminated"
+        
+        metrics = orchestrator._analyze_query(query)
+        
+        assert metrics.table_count == 1
+        assert query_fingerprint(query) == query
+    
+    def test_query_parsed_once(self, orchestrator):
+        """Test that analysis and fingerprinting share one sqlglot parse."""
+        query = "SELECT name FROM lookup_tables WHERE code = 'parsed-once'"
+        
+        with patch('flight_server.app.query_orchestrator.sqlglot.parse_one',
+                   wraps=sqlglot.parse_one) as parse_one:
+            orchestrator._analyze_query(query)
+            query_fingerprint(normalize_query(query))
+        
+        assert parse_one.call_count == 1
+    
     @patch('flight_server.app.query_orchestrator.get_duckdb_connection')
-    def test_estimate_data_size_duckdb(self, mock_get_conn):
+    def test_estimate_data_size_duckdb(self, mock_get_conn, orchestrator):
         """Test data size estimation for DuckDB tables."""
-        mock_conn = Mock()
+        mock_conn = MagicMock(spec=duckdb.DuckDBPyConnection)
         mock_conn.execute.return_value.fetchone.return_value = (5000,)
         mock_get_conn.return_value = mock_conn
         
-        orchestrator = QueryOrchestrator()
         size = orchestrator._estimate_data_size("SELECT * FROM rev", ["rev"])
         
         assert size == 5000
         mock_conn.execute.assert_called_with("SELECT COUNT(*) FROM rev")
     
     @patch('flight_server.app.query_orchestrator.get_trino_client')
-    def test_estimate_data_size_iceberg(self, mock_get_client):
+    def test_estimate_data_size_iceberg(self, mock_get_client, orchestrator):
         """Test data size estimation for Iceberg tables."""
-        mock_client = Mock()
-        mock_stats = pd.DataFrame({
-            'Column Name': [''],
-            'Row Count': [1000000]
-        })
-        mock_client.get_table_stats.return_value = mock_stats
+        mock_client = MagicMock(spec=TrinoClient)
+        mock_client.get_table_stats.return_value = ROW_COUNT_STATS_DF
         mock_get_client.return_value = mock_client
         
-        orchestrator = QueryOrchestrator()
         size = orchestrator._estimate_data_size("SELECT * FROM patient_data", ["patient_data"])
         
         assert size == 1000000
         mock_client.get_table_stats.assert_called_with("patient_data")
     
-    def test_should_use_trino_iceberg_table(self):
+    def test_should_use_trino_iceberg_table(self, orchestrator):
         """Test that Iceberg tables always use Trino."""
-        orchestrator = QueryOrchestrator()
         metrics = QueryMetrics()
         
         result = orchestrator._should_use_trino("SELECT * FROM patient_data", metrics)
         assert result is True
     
-    def test_should_use_trino_large_dataset(self):
+    def test_should_use_trino_large_dataset(self, orchestrator):
         """Test that large datasets use Trino."""
-        orchestrator = QueryOrchestrator()
-        metrics = QueryMetrics(estimated_rows=2_000_000)
+        metrics = QueryMetrics()
         
         with patch.object(orchestrator, '_estimate_data_size', return_value=2_000_000):
             result = orchestrator._should_use_trino("SELECT * FROM unknown_table", metrics)
         
         assert result is True
     
-    def test_should_use_trino_complex_query(self):
+    def test_should_use_trino_complex_query(self, orchestrator):
         """Test that complex queries use Trino."""
-        orchestrator = QueryOrchestrator()
         metrics = QueryMetrics(complexity_score=6.0)
         
         with patch.object(orchestrator, '_estimate_data_size', return_value=50_000):
@@ -174,11 +216,9 @@ class TestQueryOrchestrator:
         
         assert result is True
     
-    def test_should_use_duckdb_simple_query(self):
+    def test_should_use_duckdb_simple_query(self, orchestrator):
         """Test that simple queries use DuckDB."""
-        orchestrator = QueryOrchestrator()
         metrics = QueryMetrics(
-            estimated_rows=1000,
             complexity_score=1.0,
             table_count=1
         )
@@ -188,120 +228,99 @@ class TestQueryOrchestrator:
         
         assert result is False
     
-    @patch('flight_server.app.query_orchestrator.get_trino_client')
-    @patch('flight_server.app.query_orchestrator.get_duckdb_connection')
-    def test_execute_query_trino(self, mock_get_duckdb, mock_get_trino):
-        """Test query execution via Trino."""
-        mock_trino_client = Mock()
-        mock_trino_client.execute_query.return_value = pd.DataFrame({'count': [1000]})
-        mock_get_trino.return_value = mock_trino_client
+    def test_register_table_clears_cached_route(self, orchestrator, monkeypatch):
+        """Test that registering a table reroutes queries cached before it."""
+        monkeypatch.setattr(orchestrator, "table_registry", dict(orchestrator.table_registry))
+        metrics = QueryMetrics(complexity_score=1.0, table_count=1)
         
-        orchestrator = QueryOrchestrator()
+        with patch.object(orchestrator, '_estimate_data_size', return_value=1000):
+            assert orchestrator._should_use_trino("SELECT * FROM new_table", metrics) is False
+            orchestrator.register_table("new_table", DataSource.ICEBERG)
+            assert orchestrator._should_use_trino("SELECT * FROM new_table", metrics) is True
+    
+    def test_execute_query_trino(self, orchestrator, patched_backends):
+        """Test query execution via Trino."""
+        mock_trino_client, _ = patched_backends
+        mock_trino_client.execute_query.return_value = COUNT_DF
         
         with patch.object(orchestrator, '_should_use_trino', return_value=True):
             result = orchestrator.execute_query("SELECT COUNT(*) FROM patient_data")
         
         mock_trino_client.execute_query.assert_called_once_with("SELECT COUNT(*) FROM patient_data")
         assert len(result) == 1
-        assert result.iloc[0]['count'] == 1000
+        assert result['count'].iat[0] == 1000
     
-    @patch('flight_server.app.query_orchestrator.get_trino_client')
-    @patch('flight_server.app.query_orchestrator.get_duckdb_connection')
-    def test_execute_query_duckdb(self, mock_get_duckdb, mock_get_trino):
+    def test_execute_query_duckdb(self, orchestrator, patched_backends):
         """Test query execution via DuckDB."""
-        mock_duckdb_conn = Mock()
-        mock_cursor = Mock()
+        _, mock_duckdb_conn = patched_backends
+        mock_cursor = MagicMock(spec=duckdb.DuckDBPyConnection)
         mock_cursor.description = [('count',)]
         mock_cursor.fetchall.return_value = [(500,)]
         mock_duckdb_conn.execute.return_value = mock_cursor
-        mock_get_duckdb.return_value = mock_duckdb_conn
-        
-        orchestrator = QueryOrchestrator()
         
         with patch.object(orchestrator, '_should_use_trino', return_value=False):
             result = orchestrator.execute_query("SELECT COUNT(*) FROM local_patients")
         
         mock_duckdb_conn.execute.assert_called_once_with("SELECT COUNT(*) FROM local_patients")
         assert len(result) == 1
-        assert result.iloc[0]['count'] == 500
+        assert result['count'].iat[0] == 500
     
-    @patch('flight_server.app.query_orchestrator.get_trino_client')
-    @patch('flight_server.app.query_orchestrator.get_duckdb_connection')
-    def test_execute_query_forced_backend(self, mock_get_duckdb, mock_get_trino):
+    def test_execute_query_forced_backend(self, orchestrator, patched_backends):
         """Test forcing a specific backend."""
-        mock_trino_client = Mock()
-        mock_trino_client.execute_query.return_value = pd.DataFrame({'result': ['forced']})
-        mock_get_trino.return_value = mock_trino_client
-        
-        orchestrator = QueryOrchestrator()
+        mock_trino_client, _ = patched_backends
+        mock_trino_client.execute_query.return_value = FORCED_DF
         
         # Force Trino even for a simple query
         result = orchestrator.execute_query("SELECT 1", target_backend="trino")
         
         mock_trino_client.execute_query.assert_called_once_with("SELECT 1")
-        assert result.iloc[0]['result'] == 'forced'
+        assert result['result'].iat[0] == 'forced'
     
     @patch('flight_server.app.query_orchestrator.get_trino_client')
-    def test_get_table_info_iceberg(self, mock_get_trino):
+    def test_get_table_info_iceberg(self, mock_get_trino, orchestrator):
         """Test getting table info for Iceberg tables."""
-        mock_trino_client = Mock()
-        mock_description = pd.DataFrame({'column': ['id', 'name']})
-        mock_stats = pd.DataFrame({'stat': ['rows', 'size']})
-        mock_history = pd.DataFrame({'timestamp': ['2023-01-01']})
-        
-        mock_trino_client.describe_table.return_value = mock_description
-        mock_trino_client.get_table_stats.return_value = mock_stats
-        mock_trino_client.get_table_history.return_value = mock_history
+        mock_trino_client = MagicMock(spec=TrinoClient)
+        mock_trino_client.describe_table.return_value = DESCRIPTION_DF
+        mock_trino_client.get_table_stats.return_value = STATS_DF
+        mock_trino_client.get_table_history.return_value = HISTORY_DF
         mock_get_trino.return_value = mock_trino_client
         
-        orchestrator = QueryOrchestrator()
         info = orchestrator.get_table_info("patient_data")
         
         assert info["source"] == "iceberg"
-        assert info["description"].equals(mock_description)
-        assert info["stats"].equals(mock_stats)
-        assert info["history"].equals(mock_history)
+        assert info["description"].equals(DESCRIPTION_DF)
+        assert info["stats"].equals(STATS_DF)
+        assert info["history"].equals(HISTORY_DF)
     
     @patch('flight_server.app.query_orchestrator.get_duckdb_connection')
-    def test_get_table_info_duckdb(self, mock_get_duckdb):
+    def test_get_table_info_duckdb(self, mock_get_duckdb, orchestrator):
         """Test getting table info for DuckDB tables."""
-        mock_conn = Mock()
-        mock_conn.execute.return_value.fetchall.side_effect = [
+        mock_get_duckdb.return_value = FakeCursor([
             [('id', 'INTEGER', 'NO', '', None, ''), ('name', 'VARCHAR', 'YES', '', None, '')],  # DESCRIBE
             (1000,)  # COUNT
-        ]
-        mock_get_duckdb.return_value = mock_conn
+        ])
         
-        orchestrator = QueryOrchestrator()
         info = orchestrator.get_table_info("rev")
         
         assert info["source"] == "duckdb"
         assert info["row_count"] == 1000
         assert len(info["description"]) == 2
     
-    @patch('flight_server.app.query_orchestrator.get_trino_client')
-    @patch('flight_server.app.query_orchestrator.get_duckdb_connection')
-    def test_list_tables(self, mock_get_duckdb, mock_get_trino):
+    def test_list_tables(self, orchestrator, patched_backends):
         """Test listing tables from both backends."""
-        mock_duckdb_conn = Mock()
+        mock_trino_client, mock_duckdb_conn = patched_backends
         mock_duckdb_conn.execute.return_value.fetchall.return_value = [('rev',), ('local_patients',)]
-        mock_get_duckdb.return_value = mock_duckdb_conn
-        
-        mock_trino_client = Mock()
         mock_trino_client.list_tables.return_value = ['patient_data', 'disease_trends']
-        mock_get_trino.return_value = mock_trino_client
         
-        orchestrator = QueryOrchestrator()
         tables = orchestrator.list_tables()
         
         assert tables["duckdb"] == ['rev', 'local_patients']
         assert tables["iceberg"] == ['patient_data', 'disease_trends']
     
-    def test_close(self):
+    def test_close(self, orchestrator, monkeypatch):
         """Test closing connections."""
-        orchestrator = QueryOrchestrator()
-        orchestrator.trino_client = Mock()
-        orchestrator.duckdb_connection = Mock()
+        monkeypatch.setattr(orchestrator, "trino_client", MagicMock(spec=TrinoClient))
+        monkeypatch.setattr(orchestrator, "duckdb_connection", MagicMock(spec=duckdb.DuckDBPyConnection))
         
         orchestrator.close()
         
@@ -312,14 +331,20 @@ class TestQueryOrchestrator:
 class TestUtilityFunctions:
     """Test utility functions."""
     
-    def test_get_query_orchestrator_singleton(self):
-        """Test that get_query_orchestrator returns singleton."""
+    @patch('flight_server.app.query_orchestrator.QueryOrchestrator')
+    def test_get_query_orchestrator_singleton(self, mock_cls, monkeypatch):
+        """Test that get_query_orchestrator builds the orchestrator once and reuses it."""
+        mock_cls.return_value = sentinel.orchestrator
+        monkeypatch.setattr('flight_server.app.query_orchestrator._orchestrator', None)
+        
         orchestrator1 = get_query_orchestrator()
         orchestrator2 = get_query_orchestrator()
         
-        assert orchestrator1 is orchestrator2
+        assert orchestrator1 is orchestrator2 is sentinel.orchestrator
+        mock_cls.assert_called_once_with()
     
-    def test_get_query_orchestrator_type(self):
+    def test_get_query_orchestrator_type(self, monkeypatch):
         """Test that get_query_orchestrator returns correct type."""
+        monkeypatch.setattr('flight_server.app.query_orchestrator._orchestrator', None)
         orchestrator = get_query_orchestrator()
         assert isinstance(orchestrator, QueryOrchestrator)
@@ -1,43 +1,65 @@
 """
 Tests for Trino client integration.
 """
+import queue
 import pytest
 import pandas as pd
+import pyarrow as pa
+import requests
+import trino.dbapi
 from unittest.mock import Mock, patch, MagicMock
-from flight_server.app.trino_client import TrinoClient, TrinoConfig, get_trino_client
+from flight_server.app.trino_client import TrinoClient, TrinoConfig, get_trino_client, pooled_trino_client
 
+# Result frame shared by the tests below; it is only ever read
+QUERY_RESULT_DF = pd.DataFrame({'col1': [1, 2, 3]})
 
+
+@pytest.fixture(scope="module")
+def shared_client():
+    """Build one default TrinoClient for the whole module."""
+    return TrinoClient()
+
+
+@pytest.fixture
+def client_pool(monkeypatch):
+    """Give each test an empty client pool of its own."""
+    pool = queue.Queue(maxsize=2)
+    monkeypatch.setattr('flight_server.app.trino_client._client_pool', pool)
+    return pool
+
+
+@pytest.fixture
+def client(shared_client, monkeypatch):
+    """Shared client with its lazily opened connection reset for each test."""
+    monkeypatch.setattr(shared_client, "_connection", None)
+    monkeypatch.setattr(shared_client, "_cursor", None)
+    return shared_client
+
+
+@pytest.mark.fast
+@pytest.mark.no_cover
 class TestTrinoConfig:
     """Test TrinoConfig dataclass."""
     
-    def test_default_config(self):
-        """Test default configuration values."""
-        config = TrinoConfig()
-        
-        assert config.host == "localhost"
-        assert config.port == 8080
-        assert config.user == "datahut"
-        assert config.catalog == "iceberg"
-        assert config.schema == "default"
-        assert config.source == "datahut-duckhouse"
-        assert "datahut" in config.client_tags
-        assert "iceberg" in config.client_tags
-    
-    def test_custom_config(self):
-        """Test custom configuration values."""
-        config = TrinoConfig(
-            host="custom-host",
-            port=9999,
-            user="custom-user",
-            catalog="custom-catalog",
-            schema="custom-schema"
-        )
-        
-        assert config.host == "custom-host"
-        assert config.port == 9999
-        assert config.user == "custom-user"
-        assert config.catalog == "custom-catalog"
-        assert config.schema == "custom-schema"
+    @pytest.mark.parametrize("kwargs, expected", [
+        ({}, dict(
+            host="localhost", port=8080, user="datahut", catalog="iceberg", schema="default",
+            source="datahut-duckhouse", client_tags=["datahut", "iceberg"]
+        )),
+        (dict(
+            host="custom-host", port=9999, user="custom-user",
+            catalog="custom-catalog", schema="custom-schema"
+        ), dict(
+            host="custom-host", port=9999, user="custom-user",
+            catalog="custom-catalog", schema="custom-schema"
+        )),
+    ], ids=["default", "custom"])
+    def test_config(self, kwargs, expected):
+        """Test default and custom configuration values."""
+        config = TrinoConfig(**kwargs)
+        
+        for field, value in expected.items():
+            assert getattr(config, field) == value, field
 
 
 class TestTrinoClient:
@@ -46,7 +68,7 @@ class TestTrinoClient:
     @patch('flight_server.app.trino_client.trino')
     def test_connection_creation(self, mock_trino):
         """Test connection creation."""
-        mock_connection = Mock()
+        mock_connection = MagicMock(spec=trino.dbapi.Connection)
         mock_trino.dbapi.connect.return_value = mock_connection
         
         config = TrinoConfig()
@@ -68,25 +90,24 @@ class TestTrinoClient:
         )
         
         assert connection == mock_connection
-    
+
     @patch('flight_server.app.trino_client.trino')
-    def test_execute_query_success(self, mock_trino):
+    def test_connection_uses_http_session(self, mock_trino):
+        """Test that a configured HTTP session is handed to the Trino connection."""
+        session = MagicMock(spec=requests.Session)
+        config = TrinoConfig(http_session=session)
+        client = TrinoClient(config)
+
+        client.connection
+
+        _, kwargs = mock_trino.dbapi.connect.call_args
+        assert kwargs["http_session"] is session
+
+    def test_execute_query_success(self, client, trino_result):
         """Test successful query execution."""
-        # Mock connection and cursor
-        mock_cursor = Mock()
-        mock_cursor.description = [['col1'], ['col2']]
-        mock_cursor.fetchall.return_value = [['val1', 'val2'], ['val3', 'val4']]
-        
-        mock_connection = Mock()
-        mock_connection.cursor.return_value.__enter__.return_value = mock_cursor
-        
-        mock_trino.dbapi.connect.return_value = mock_connection
+        mock_cursor = trino_result(['col1', 'col2'], [['val1', 'val2'], ['val3', 'val4']])
         
-        client = TrinoClient()
-        
-        # Mock the monitoring decorator
-        with patch('flight_server.app.trino_client.trace_operation'):
-            result = client.execute_query("SELECT * FROM test_table")
+        result = client.execute_query("SELECT * FROM test_table")
         
         # Verify cursor calls
         mock_cursor.execute.assert_called_once_with("SELECT * FROM test_table")
@@ -97,111 +118,107 @@ class TestTrinoClient:
         assert len(result) == 2
         assert list(result.columns) == ['col1', 'col2']
     
-    @patch('flight_server.app.trino_client.trino')
-    def test_execute_query_with_parameters(self, mock_trino):
+    def test_execute_query_with_parameters(self, client, trino_result):
         """Test query execution with parameters."""
-        mock_cursor = Mock()
-        mock_cursor.description = [['count']]
-        mock_cursor.fetchall.return_value = [[5]]
-        
-        mock_connection = Mock()
-        mock_connection.cursor.return_value.__enter__.return_value = mock_cursor
-        
-        mock_trino.dbapi.connect.return_value = mock_connection
+        mock_cursor = trino_result(['count'], [[5]])
         
-        client = TrinoClient()
-        
-        with patch('flight_server.app.trino_client.trace_operation'):
-            result = client.execute_query(
-                "SELECT COUNT(*) FROM test_table WHERE id = ?",
-                parameters={'id': 123}
-            )
+        result = client.execute_query(
+            "SELECT COUNT(*) FROM test_table WHERE id = ?",
+            parameters={'id': 123}
+        )
         
         mock_cursor.execute.assert_called_once_with(
             "SELECT COUNT(*) FROM test_table WHERE id = ?",
             {'id': 123}
         )
     
-    @patch('flight_server.app.trino_client.trino')
-    def test_list_catalogs(self, mock_trino):
-        """Test listing catalogs."""
-        mock_cursor = Mock()
-        mock_cursor.description = [['Catalog']]
-        mock_cursor.fetchall.return_value = [['iceberg'], ['memory'], ['system']]
+    def test_execute_query_arrow(self, client, trino_mocks):
+        """Test query execution returning an Arrow table built from fetchmany pages."""
+        mock_cursor, _ = trino_mocks
+        mock_cursor.description = [['disease'], ['count']]
+        mock_cursor.fetchmany.side_effect = [
+            [['Flu', 3], ['Cold', 2]],
+            [['Allergy', 1]],
+            [],
+        ]
+        
+        result = client.execute_query_arrow("SELECT disease, COUNT(*) FROM test_table GROUP BY disease")
+        
+        assert isinstance(result, pa.Table)
+        assert result.column_names == ['disease', 'count']
+        assert result.column('disease').to_pylist() == ['Flu', 'Cold', 'Allergy']
+        assert result.num_rows == 3
+        mock_cursor.fetchall.assert_not_called()
+    
+    def test_execute_query_arrow_uses_declared_types(self, client, trino_mocks):
+        """Test that every page is built with the column types from the cursor description."""
+        mock_cursor, _ = trino_mocks
+        mock_cursor.description = [['price', 'double']]
+        mock_cursor.fetchmany.side_effect = [[[1], [2]], [[2.5]], []]
         
-        mock_connection = Mock()
-        mock_connection.cursor.return_value.__enter__.return_value = mock_cursor
+        result = client.execute_query_arrow("SELECT price FROM test_table")
         
-        mock_trino.dbapi.connect.return_value = mock_connection
+        assert result.schema.field('price').type == pa.float64()
+        assert result.column('price').to_pylist() == [1.0, 2.0, 2.5]
+    
+    def test_execute_query_arrow_widens_undeclared_types(self, client, trino_mocks):
+        """Test that pages inferred as int64 and double join into one double column."""
+        mock_cursor, _ = trino_mocks
+        mock_cursor.description = [['price']]
+        mock_cursor.fetchmany.side_effect = [[[1], [2]], [[2.5]], []]
         
-        client = TrinoClient()
+        result = client.execute_query_arrow("SELECT price FROM test_table")
         
-        with patch('flight_server.app.trino_client.trace_operation'):
-            catalogs = client.list_catalogs()
+        assert result.schema.field('price').type == pa.float64()
+        assert result.column('price').to_pylist() == [1.0, 2.0, 2.5]
+    
+    def test_execute_query_arrow_empty_result_keeps_types(self, client, trino_mocks):
+        """Test that an empty result still carries the declared column types."""
+        mock_cursor, _ = trino_mocks
+        mock_cursor.description = [['disease', 'varchar(50)'], ['cases', 'bigint']]
+        mock_cursor.fetchmany.side_effect = [[]]
+        
+        result = client.execute_query_arrow("SELECT disease, cases FROM test_table WHERE false")
+        
+        assert result.num_rows == 0
+        assert result.schema.types == [pa.string(), pa.int64()]
+    
+    def test_list_catalogs(self, client, trino_result):
+        """Test listing catalogs."""
+        mock_cursor = trino_result(['Catalog'], [['iceberg'], ['memory'], ['system']])
+        
+        catalogs = client.list_catalogs()
         
         mock_cursor.execute.assert_called_once_with("SHOW CATALOGS")
         assert catalogs == ['iceberg', 'memory', 'system']
     
-    @patch('flight_server.app.trino_client.trino')
-    def test_list_schemas(self, mock_trino):
+    def test_list_schemas(self, client, trino_result):
         """Test listing schemas."""
-        mock_cursor = Mock()
-        mock_cursor.description = [['Schema']]
-        mock_cursor.fetchall.return_value = [['default'], ['test']]
+        mock_cursor = trino_result(['Schema'], [['default'], ['test']])
         
-        mock_connection = Mock()
-        mock_connection.cursor.return_value.__enter__.return_value = mock_cursor
-        
-        mock_trino.dbapi.connect.return_value = mock_connection
-        
-        client = TrinoClient()
-        
-        with patch('flight_server.app.trino_client.trace_operation'):
-            schemas = client.list_schemas('iceberg')
+        schemas = client.list_schemas('iceberg')
         
         mock_cursor.execute.assert_called_once_with("SHOW SCHEMAS FROM iceberg")
         assert schemas == ['default', 'test']
     
-    @patch('flight_server.app.trino_client.trino')
-    def test_list_tables(self, mock_trino):
+    def test_list_tables(self, client, trino_result):
         """Test listing tables."""
-        mock_cursor = Mock()
-        mock_cursor.description = [['Table']]
-        mock_cursor.fetchall.return_value = [['patient_data'], ['disease_trends']]
-        
-        mock_connection = Mock()
-        mock_connection.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_cursor = trino_result(['Table'], [['patient_data'], ['disease_trends']])
         
-        mock_trino.dbapi.connect.return_value = mock_connection
-        
-        client = TrinoClient()
-        
-        with patch('flight_server.app.trino_client.trace_operation'):
-            tables = client.list_tables('iceberg', 'default')
+        tables = client.list_tables('iceberg', 'default')
         
         mock_cursor.execute.assert_called_once_with("SHOW TABLES FROM iceberg.default")
         assert tables == ['patient_data', 'disease_trends']
     
-    @patch('flight_server.app.trino_client.trino')
-    def test_create_table_as_select(self, mock_trino):
+    def test_create_table_as_select(self, client, trino_result):
         """Test creating table as select."""
-        mock_cursor = Mock()
-        mock_cursor.description = None
-        mock_cursor.fetchall.return_value = []
-        
-        mock_connection = Mock()
-        mock_connection.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_cursor = trino_result([], [])
         
-        mock_trino.dbapi.connect.return_value = mock_connection
-        
-        client = TrinoClient()
-        
-        with patch('flight_server.app.trino_client.trace_operation'):
-            result = client.create_table_as_select(
-                target_table="new_table",
-                source_query="SELECT * FROM existing_table",
-                table_properties={"format": "PARQUET"}
-            )
+        result = client.create_table_as_select(
+            target_table="new_table",
+            source_query="SELECT * FROM existing_table",
+            table_properties={"format": "PARQUET"}
+        )
         
         expected_query = """
                 CREATE TABLE iceberg.default.new_table WITH ('format' = 'PARQUET')
@@ -211,33 +228,21 @@ class TestTrinoClient:
         mock_cursor.execute.assert_called_once()
         assert result is True
     
-    @patch('flight_server.app.trino_client.trino')
-    def test_optimize_table(self, mock_trino):
+    def test_optimize_table(self, client, trino_result):
         """Test table optimization."""
-        mock_cursor = Mock()
-        mock_cursor.description = None
-        mock_cursor.fetchall.return_value = []
+        mock_cursor = trino_result([], [])
         
-        mock_connection = Mock()
-        mock_connection.cursor.return_value.__enter__.return_value = mock_cursor
-        
-        mock_trino.dbapi.connect.return_value = mock_connection
-        
-        client = TrinoClient()
-        
-        with patch('flight_server.app.trino_client.trace_operation'):
-            result = client.optimize_table("test_table")
+        result = client.optimize_table("test_table")
         
         mock_cursor.execute.assert_called_once_with(
             "CALL iceberg.system.rewrite_data_files('default', 'test_table')"
         )
         assert result is True
     
-    def test_close_connection(self):
+    def test_close_connection(self, client, monkeypatch):
         """Test closing connection."""
-        mock_connection = Mock()
-        client = TrinoClient()
-        client._connection = mock_connection
+        mock_connection = MagicMock(spec=trino.dbapi.Connection)
+        monkeypatch.setattr(client, "_connection", mock_connection)
         
         client.close()
         
@@ -251,7 +256,7 @@ class TestUtilityFunctions:
     @patch('flight_server.app.trino_client.TrinoClient')
     def test_get_trino_client_default(self, mock_client_class):
         """Test getting Trino client with default configuration."""
-        mock_client = Mock()
+        mock_client = MagicMock(spec=TrinoClient)
         mock_client_class.return_value = mock_client
         
         with patch.dict('os.environ', {}, clear=True):
@@ -268,7 +273,7 @@ class TestUtilityFunctions:
     @patch('flight_server.app.trino_client.TrinoClient')
     def test_get_trino_client_custom_env(self, mock_client_class):
         """Test getting Trino client with custom environment variables."""
-        mock_client = Mock()
+        mock_client = MagicMock(spec=TrinoClient)
         mock_client_class.return_value = mock_client
         
         with patch.dict('os.environ', {
@@ -288,12 +293,11 @@ class TestUtilityFunctions:
         assert config.schema == "custom-schema"
     
     @patch('flight_server.app.trino_client.get_trino_client')
-    def test_query_iceberg_table(self, mock_get_client):
+    def test_query_iceberg_table(self, mock_get_client, client_pool):
         """Test querying Iceberg table utility function."""
-        mock_client = Mock()
-        mock_client.config.catalog = "iceberg"
-        mock_client.config.schema = "default"
-        mock_client.execute_query.return_value = pd.DataFrame({'col1': [1, 2, 3]})
+        mock_client = MagicMock(spec=TrinoClient)
+        mock_client.config = TrinoConfig(catalog="iceberg", schema="default")
+        mock_client.execute_query.return_value = QUERY_RESULT_DF
         
         mock_get_client.return_value = mock_client
         
@@ -304,5 +308,32 @@ class TestUtilityFunctions:
         mock_client.execute_query.assert_called_once_with(
             "SELECT * FROM iceberg.default.test_table LIMIT 10"
         )
-        mock_client.close.assert_called_once()
+        mock_client.close.assert_not_called()
+        assert client_pool.get_nowait() is mock_client
         assert len(result) == 3
+    
+    @patch('flight_server.app.trino_client.get_trino_client')
+    def test_pooled_trino_client_reuses_client(self, mock_get_client, client_pool):
+        """Test that a returned client is handed out again instead of reconnecting."""
+        mock_get_client.return_value = MagicMock(spec=TrinoClient)
+        
+        with pooled_trino_client() as first:
+            pass
+        with pooled_trino_client() as second:
+            pass
+        
+        assert first is second
+        mock_get_client.assert_called_once_with()
+    
+    @patch('flight_server.app.trino_client.get_trino_client')
+    def test_pooled_trino_client_closes_on_error(self, mock_get_client, client_pool):
+        """Test that a client whose block raised is closed rather than pooled."""
+        mock_client = MagicMock(spec=TrinoClient)
+        mock_get_client.return_value = mock_client
+        
+        with pytest.raises(RuntimeError):
+            with pooled_trino_client():
+                raise RuntimeError("query failed")
+        
+        mock_client.close.assert_called_once()
+        assert client_pool.empty()
@@ -14,31 +14,40 @@ from flight_server.app.utils import (
 )
 
 
+@pytest.fixture
+def env(monkeypatch):
+    """Serve os.environ.get (and so os.getenv) from an empty dict the test can fill."""
+    variables = {}
+    monkeypatch.setattr(os.environ, "get", lambda key, default=None: variables.get(key, default))
+    return variables
+
+
 class TestDuckDBUtils:
     """Test DuckDB utility functions."""
 
-    def test_get_duckdb_path_default(self):
+    @pytest.mark.fast
+    def test_get_duckdb_path_default(self, env):
         """Test get_duckdb_path with default path."""
-        with patch.dict(os.environ, {}, clear=True):
-            path = get_duckdb_path()
-            assert path.endswith("ingestion/data/duckhouse.duckdb")
+        path = get_duckdb_path()
+        assert path.endswith("ingestion/data/duckhouse.duckdb")
 
-    def test_get_duckdb_path_custom(self):
+    @pytest.mark.fast
+    def test_get_duckdb_path_custom(self, env):
         """Test get_duckdb_path with custom path."""
         custom_path = "/custom/path/test.duckdb"
-        with patch.dict(os.environ, {'DUCKDB_PATH': custom_path}):
-            path = get_duckdb_path()
-            assert path == custom_path
+        env['DUCKDB_PATH'] = custom_path
+        path = get_duckdb_path()
+        assert path == custom_path
 
-    @patch('duckdb.connect')
-    @patch('os.makedirs')
-    def test_get_duckdb_connection(self, mock_makedirs, mock_connect):
+    def test_get_duckdb_connection(self, mocker, env):
         """Test get_duckdb_connection creates connection."""
+        mock_makedirs = mocker.patch('os.makedirs')
+        mock_connect = mocker.patch('duckdb.connect')
         mock_connection = Mock()
         mock_connect.return_value = mock_connection
+        env['DUCKDB_PATH'] = '/test/path.duckdb'
         
-        with patch.dict(os.environ, {'DUCKDB_PATH': '/test/path.duckdb'}):
-            result = get_duckdb_connection()
+        result = get_duckdb_connection()
             
         mock_makedirs.assert_called_once()
         mock_connect.assert_called_once_with('/test/path.duckdb')
@@ -49,17 +58,17 @@ class TestS3Utils:
     """Test S3/MinIO utility functions."""
 
     @patch('s3fs.S3FileSystem')
-    def test_get_s3_filesystem(self, mock_s3fs):
+    def test_get_s3_filesystem(self, mock_s3fs, env):
         """Test get_s3_filesystem creates filesystem."""
         mock_fs = Mock()
         mock_s3fs.return_value = mock_fs
-        
-        with patch.dict(os.environ, {
+        env.update({
             'AWS_ACCESS_KEY_ID': 'test_key',
             'AWS_SECRET_ACCESS_KEY': 'test_secret',
             'S3_ENDPOINT': 'http://localhost:9000'
-        }):
-            result = get_s3_filesystem()
+        })
+        
+        result = get_s3_filesystem()
             
         mock_s3fs.assert_called_once_with(
             key='test_key',
@@ -68,46 +77,44 @@ class TestS3Utils:
         )
         assert result == mock_fs
 
-    def test_get_iceberg_warehouse_path_default(self):
-        """Test get_iceberg_warehouse_path with default value."""
-        with patch.dict(os.environ, {}, clear=True):
-            path = get_iceberg_warehouse_path()
-            assert path == "s3://duckhouse-warehouse/"
-
-    def test_get_iceberg_warehouse_path_custom(self):
-        """Test get_iceberg_warehouse_path with custom value."""
-        custom_path = "s3://my-warehouse/"
-        with patch.dict(os.environ, {'ICEBERG_WAREHOUSE': custom_path}):
-            path = get_iceberg_warehouse_path()
-            assert path == custom_path
+    @pytest.mark.fast
+    @pytest.mark.parametrize("variables, expected", [
+        ({}, "s3://duckhouse-warehouse/"),
+        ({'ICEBERG_WAREHOUSE': "s3://my-warehouse/"}, "s3://my-warehouse/"),
+    ], ids=["default", "custom"])
+    def test_get_iceberg_warehouse_path(self, env, variables, expected):
+        """Test get_iceberg_warehouse_path with default and custom values."""
+        env.update(variables)
+        path = get_iceberg_warehouse_path()
+        assert path == expected
 
 
+@pytest.mark.usefixtures("xorq_flight_client")
 class TestFlightUtils:
     """Test Arrow Flight utility functions."""
 
     @patch('xorq.flight.client.FlightClient')
-    def test_get_flight_client_default(self, mock_client_class):
+    def test_get_flight_client_default(self, mock_client_class, env):
         """Test get_flight_client with default host and port."""
         mock_client = Mock()
         mock_client_class.return_value = mock_client
         
-        with patch.dict(os.environ, {}, clear=True):
-            result = get_flight_client()
+        result = get_flight_client()
             
         mock_client_class.assert_called_once_with("grpc://localhost:8815")
         assert result == mock_client
 
     @patch('xorq.flight.client.FlightClient')
-    def test_get_flight_client_custom(self, mock_client_class):
+    def test_get_flight_client_custom(self, mock_client_class, env):
         """Test get_flight_client with custom host and port."""
         mock_client = Mock()
         mock_client_class.return_value = mock_client
-        
-        with patch.dict(os.environ, {
+        env.update({
             'FLIGHT_SERVER_HOST': 'custom-host',
             'FLIGHT_SERVER_PORT': '9999'
-        }):
-            result = get_flight_client()
+        })
+        
+        result = get_flight_client()
             
         mock_client_class.assert_called_once_with("grpc://custom-host:9999")
         assert result == mock_client
@@ -0,0 +1,241 @@
+"""
+Tests for the XORQ registry's mutation log and snapshots.
+"""
+import importlib.util
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+CORE_PATH = Path(__file__).resolve().parent.parent / "xorq" / "core.py"
+
+BILLED_QUERY_META = {"engine": "duckdb", "rows": 5000, "bill": True}
+
+
+def load_core():
+    """Load xorq/core.py by path.
+    
+    The repo's top-level xorq/ directory can shadow the installed xorq package
+    (or the other way round), so ``import xorq.core`` is not reliable here.
+    """
+    spec = importlib.util.spec_from_file_location("xorq_core", CORE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def core():
+    """Load xorq/core.py once for the whole module."""
+    return load_core()
+
+
+@pytest.fixture
+def open_registry(core, tmp_path):
+    """Return a factory that opens an orchestrator on the same store, like a restart."""
+    storage_path = str(tmp_path / "metadata.db")
+    opened = []
+    
+    def open_():
+        opened.append(core.XORQOrchestrator(storage_path))
+        return opened[-1]
+    
+    yield open_
+    for registry in opened:
+        registry.close()
+
+
+def wait_for(condition, timeout=5.0):
+    """Poll ``condition`` until it holds or ``timeout`` seconds pass."""
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.mark.fast
+def test_import_touches_no_files(tmp_path, monkeypatch):
+    """Test that loading the module does not open the registry."""
+    monkeypatch.chdir(tmp_path)
+    
+    load_core()
+    
+    assert list(tmp_path.iterdir()) == []
+
+
+class TestRegistrySingleton:
+    """Test the lazily opened process-wide registry."""
+    
+    def test_opens_at_xorq_storage(self, core, tmp_path, monkeypatch):
+        """Test that the registry is opened once, at $XORQ_STORAGE, and can be closed."""
+        monkeypatch.setenv("XORQ_STORAGE", str(tmp_path / "metadata.db"))
+        
+        registry = core.get_xorq_registry()
+        try:
+            assert core.get_xorq_registry() is registry
+            assert registry.wal_path == tmp_path / "metadata.jsonl"
+        finally:
+            core.close_xorq_registry()
+        
+        assert core._registry is None
+
+
+class TestTenantReads:
+    """Test reading tenant metrics while they are being written."""
+    
+    def test_metric_log_during_writes(self, open_registry):
+        """Test that metric_log and billing_summary copy the columns under the tenant lock."""
+        registry = open_registry()
+        registry.register_tenant("acme", {"metrics_cap": 50})
+        tenant = registry.get_tenant_info("acme")
+        done = threading.Event()
+        
+        def write():
+            for i in range(2000):
+                registry.track_query_metric("acme", f"SELECT {i}", BILLED_QUERY_META)
+            done.set()
+        
+        writer = threading.Thread(target=write)
+        writer.start()
+        while not done.is_set():
+            assert len(tenant.metric_log) <= 50
+            summary = tenant.billing_summary
+            assert summary["total_amount"] == 5 * summary["total_bill_events"]
+        writer.join()
+
+
+class TestMutationLog:
+    """Test replaying the mutation log on startup."""
+    
+    def test_restart_round_trip(self, open_registry):
+        """Test that a restarted registry matches the one that wrote the log."""
+        registry = open_registry()
+        registry.register_tenant("acme", {"plan": "pro"})
+        registry.add_dataset("acme", {"name": "sales"})
+        registry.add_catalog("acme", "acme_iceberg")
+        registry.track_query_metric("acme", "SELECT 1", BILLED_QUERY_META)
+        before = registry.get_tenant_info("acme")
+        
+        after = open_registry().get_tenant_info("acme")
+        
+        assert after.config == {"plan": "pro"}
+        assert after.datasets == [{"name": "sales"}]
+        assert after.catalogs == ["acme_iceberg"]
+        assert after.created_at == before.created_at
+        assert after.updated_at == before.updated_at
+        assert after.metric_log == before.metric_log
+        assert after.billing_summary == before.billing_summary
+    
+    def test_torn_trailing_line_is_skipped(self, open_registry):
+        """Test that a partially written last entry is ignored on replay."""
+        registry = open_registry()
+        registry.register_tenant("acme", {"plan": "pro"})
+        with open(registry.wal_path, "ab") as wal:
+            wal.write(b'{"op": "add_dataset", "tenant_id": "ac')
+        
+        tenant = open_registry().get_tenant_info("acme")
+        
+        assert tenant.config == {"plan": "pro"}
+        assert tenant.datasets == []
+    
+    def test_entry_after_torn_line_survives(self, open_registry):
+        """Test that an entry logged after a restart over a partial line is replayed."""
+        registry = open_registry()
+        registry.register_tenant("acme", {"plan": "pro"})
+        registry.close()
+        with open(registry.wal_path, "ab") as wal:
+            wal.write(b'{"op": "add_dataset", "tena')
+        
+        restarted = open_registry()
+        restarted.add_dataset("acme", {"name": "sales"})
+        restarted.close()
+        
+        assert open_registry().get_tenant_info("acme").datasets == [{"name": "sales"}]
+    
+    def test_replay_longer_than_snapshot_interval(self, core, open_registry, monkeypatch):
+        """Test that replaying more than SNAPSHOT_EVERY entries does not snapshot mid-replay."""
+        registry = open_registry()
+        registry.register_tenant("acme", {})
+        for i in range(6):
+            registry.track_query_metric("acme", f"SELECT {i}", {})
+        monkeypatch.setattr(core, "SNAPSHOT_EVERY", 5)
+        
+        tenant = open_registry().get_tenant_info("acme")
+        
+        assert len(tenant.metrics) == 6
+
+
+class TestSnapshot:
+    """Test folding the mutation log into a snapshot."""
+    
+    def test_snapshot_rotates_log(self, open_registry):
+        """Test that a snapshot leaves only the new generation's header in the log."""
+        registry = open_registry()
+        registry.register_tenant("acme", {"plan": "pro"})
+        registry.track_query_metric("acme", "SELECT 1", BILLED_QUERY_META)
+        
+        registry.snapshot()
+        
+        assert registry.storage_path.exists()
+        assert not registry.prev_wal_path.exists()
+        assert registry.wal_path.read_bytes() == b'{"op": "generation", "generation": 1}\n'
+        
+        tenant = open_registry().get_tenant_info("acme")
+        assert tenant.config == {"plan": "pro"}
+        assert tenant.bill_total == 5
+    
+    def test_snapshot_runs_in_background(self, core, open_registry, monkeypatch):
+        """Test that reaching SNAPSHOT_EVERY wakes the snapshot thread."""
+        monkeypatch.setattr(core, "SNAPSHOT_EVERY", 3)
+        registry = open_registry()
+        registry.register_tenant("acme", {"plan": "pro"})
+        registry.track_query_metric("acme", "SELECT 1", BILLED_QUERY_META)
+        registry.track_query_metric("acme", "SELECT 2", BILLED_QUERY_META)
+        
+        assert wait_for(registry.storage_path.exists)
+        registry.close()
+        
+        tenant = open_registry().get_tenant_info("acme")
+        assert tenant.bill_total == 10
+    
+    def test_covered_log_is_not_replayed_twice(self, open_registry):
+        """Test that a rotated log left behind after its snapshot landed is skipped."""
+        registry = open_registry()
+        registry.register_tenant("acme", {})
+        registry.track_query_metric("acme", "SELECT 1", BILLED_QUERY_META)
+        covered_log = registry.wal_path.read_bytes()
+        registry.snapshot()
+        # As if the process died before deleting the rotated log
+        registry.prev_wal_path.write_bytes(covered_log)
+        registry.close()
+        
+        restarted = open_registry()
+        tenant = restarted.get_tenant_info("acme")
+        
+        assert len(tenant.metrics) == 1
+        assert tenant.bill_total == 5
+        assert not restarted.prev_wal_path.exists()
+    
+    def test_failed_snapshot_keeps_rotated_log(self, open_registry, monkeypatch):
+        """Test that entries in the rotated log survive a snapshot that was never written."""
+        registry = open_registry()
+        registry.register_tenant("acme", {})
+        registry.track_query_metric("acme", "SELECT 1", BILLED_QUERY_META)
+        
+        def fail(state):
+            raise OSError("disk full")
+        
+        with monkeypatch.context() as mp:
+            mp.setattr(registry, "_write_snapshot", fail)
+            with pytest.raises(OSError):
+                registry.snapshot()
+        registry.track_query_metric("acme", "SELECT 2", BILLED_QUERY_META)
+        registry.close()
+        
+        restarted = open_registry()
+        tenant = restarted.get_tenant_info("acme")
+        
+        assert tenant.bill_total == 10
+        assert not restarted.prev_wal_path.exists()
+        assert open_registry().get_tenant_info("acme").bill_total == 10
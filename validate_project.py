@@ -4,104 +4,146 @@ Simple project validation script.
 """
 import os
 import sys
-import subprocess
+import py_compile
+import tomllib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-def run_command(command, description):
-    """Run a command and return success status."""
-    print(f"Running: {description}")
-    try:
-        result = subprocess.run(command, shell=True, capture_output=True, text=True)
-        if result.returncode == 0:
-            print(f"{description} - SUCCESS")
-            return True
-        else:
-            print(f"{description} - FAILED")
-            print(f"Error: {result.stderr}")
-            return False
-    except Exception as e:
-        print(f"{description} - ERROR: {e}")
-        return False
+# Files that must exist, with a description for the report
+REQUIRED_FILES = (
+    ("pyproject.toml", "Poetry configuration"),
+    ("README.md", "Project documentation"),
+    ("docker-compose.yml", "Docker Compose configuration"),
+    (".env", "Environment variables"),
+    ("Makefile", "Development automation"),
+    ("flight_server/app/app.py", "Main application"),
+    ("flight_server/app/utils.py", "Utility functions"),
+    ("flight_server/app/backends/hybrid_backend.py", "Hybrid backend"),
+    ("flight_server/app/trino_client.py", "Trino client"),
+    ("flight_server/app/query_orchestrator.py", "Query orchestrator"),
+    ("flight_server/app/monitoring.py", "Monitoring utilities"),
+    ("tests/conftest.py", "Test configuration"),
+    ("tests/test_utils.py", "Utility tests"),
+    ("tests/test_trino_client.py", "Trino client tests"),
+    ("config/trino/etc/trino.properties", "Trino configuration"),
+    ("config/trino/etc/catalog/iceberg.properties", "Iceberg catalog"),
+    ("transform/dbt_project/dbt_project.yml", "dbt project configuration"),
+    ("transform/dbt_project/config/dbt_profiles.yml", "dbt profiles"),
+    ("scripts/query_trino.py", "Trino query script"),
+    ("scripts/setup_iceberg_tables.py", "Iceberg setup script"),
+    ("docs/TRINO_DBT_INTEGRATION.md", "Trino/dbt documentation"),
+    (".github/workflows/ci.yml", "CI/CD pipeline"),
+    (".pre-commit-config.yaml", "Pre-commit configuration"),
+)
+
+# Python sources that must byte-compile
+PYTHON_FILES = (
+    "flight_server/app/app.py",
+    "flight_server/app/utils.py",
+    "flight_server/app/backends/hybrid_backend.py",
+    "flight_server/app/trino_client.py",
+    "flight_server/app/query_orchestrator.py",
+    "flight_server/app/monitoring.py",
+    "tests/conftest.py",
+    "tests/test_utils.py",
+    "tests/test_hybrid_backend.py",
+    "tests/test_trino_client.py",
+    "tests/test_query_orchestrator.py",
+    "scripts/ingest_flight.py",
+    "scripts/create_tenant.py",
+    "scripts/delete_tenant.py",
+    "scripts/query_trino.py",
+    "scripts/setup_iceberg_tables.py",
+    "scripts/run_dbt.py",
+    "scripts/demonstrate_architecture.py",
+)
 
-def check_file_exists(filepath, description):
+def check_file_exists(filepath):
     """Check if a file exists."""
+    return os.path.isfile(filepath)
+
+def list_directory(directory):
+    """Return the entry names of a directory, or an empty set if it cannot be read."""
+    try:
+        with os.scandir(directory) as entries:
+            return {entry.name for entry in entries}
+    except OSError:
+        return set()
+
+def check_files_exist(filepaths):
+    """Check which files exist, listing each parent directory only once."""
+    groups = defaultdict(list)
+    for index, filepath in enumerate(filepaths):
+        path = Path(filepath)
+        groups[path.parent].append((index, path.name))
+    
+    with ThreadPoolExecutor(max_workers=min(32, len(groups))) as executor:
+        listings = list(executor.map(list_directory, groups))
+    
+    found = [False] * len(filepaths)
+    for members, present in zip(groups.values(), listings):
+        for index, name in members:
+            found[index] = name in present
+    return found
+
+def check_syntax(py_file):
+    """Byte-compile a Python file in-process; return (success, error message)."""
+    try:
+        py_compile.compile(py_file, doraise=True)
+        return True, ""
+    except py_compile.PyCompileError as e:
+        return False, e.msg
+
+def check_toml(filepath):
+    """Parse a TOML file in-process; return (success, error message)."""
+    try:
+        tomllib.loads(Path(filepath).read_text(encoding="utf-8"))
+        return True, ""
+    except (OSError, tomllib.TOMLDecodeError) as e:
+        return False, str(e)
+
+def report_file(description, exists):
+    """Print the outcome of a file check and return it."""
     print(f"Checking: {description}")
-    if Path(filepath).exists():
-        print(f"{description} - EXISTS")
-        return True
+    print(f"{description} - {'EXISTS' if exists else 'MISSING'}")
+    return exists
+
+def report_outcome(description, outcome):
+    """Print the outcome of a (success, error) check and return whether it passed."""
+    success, error = outcome
+    print(f"Running: {description}")
+    if success:
+        print(f"{description} - SUCCESS")
     else:
-        print(f"{description} - MISSING")
-        return False
+        print(f"{description} - FAILED")
+        print(f"Error: {error}")
+    return success
 
 def main():
     """Main validation function."""
     print("DataHut-DuckHouse Project Validation")
     print("=" * 50)
     
-    # Check required files
-    required_files = [
-        ("pyproject.toml", "Poetry configuration"),
-        ("README.md", "Project documentation"),
-        ("docker-compose.yml", "Docker Compose configuration"),
-        (".env", "Environment variables"),
-        ("Makefile", "Development automation"),
-        ("flight_server/app/app.py", "Main application"),
-        ("flight_server/app/utils.py", "Utility functions"),
-        ("flight_server/app/backends/hybrid_backend.py", "Hybrid backend"),
-        ("flight_server/app/trino_client.py", "Trino client"),
-        ("flight_server/app/query_orchestrator.py", "Query orchestrator"),
-        ("flight_server/app/monitoring.py", "Monitoring utilities"),
-        ("tests/conftest.py", "Test configuration"),
-        ("tests/test_utils.py", "Utility tests"),
-        ("tests/test_trino_client.py", "Trino client tests"),
-        ("config/trino/etc/trino.properties", "Trino configuration"),
-        ("config/trino/etc/catalog/iceberg.properties", "Iceberg catalog"),
-        ("transform/dbt_project/dbt_project.yml", "dbt project configuration"),
-        ("transform/dbt_project/config/dbt_profiles.yml", "dbt profiles"),
-        ("scripts/query_trino.py", "Trino query script"),
-        ("scripts/setup_iceberg_tables.py", "Iceberg setup script"),
-        ("docs/TRINO_DBT_INTEGRATION.md", "Trino/dbt documentation"),
-        (".github/workflows/ci.yml", "CI/CD pipeline"),
-        (".pre-commit-config.yaml", "Pre-commit configuration"),
-    ]
-    
+    # The checks run concurrently; results are reported afterwards in list order
     print("\nFile Structure Check:")
-    file_checks = []
-    for filepath, description in required_files:
-        file_checks.append(check_file_exists(filepath, description))
+    found = check_files_exist([filepath for filepath, _ in REQUIRED_FILES])
+    file_checks = [report_file(description, exists) for (_, description), exists in zip(REQUIRED_FILES, found)]
     
     # Check Python syntax
     print("\nPython Syntax Check:")
-    python_files = [
-        "flight_server/app/app.py",
-        "flight_server/app/utils.py",
-        "flight_server/app/backends/hybrid_backend.py",
-        "flight_server/app/trino_client.py",
-        "flight_server/app/query_orchestrator.py",
-        "flight_server/app/monitoring.py",
-        "tests/conftest.py",
-        "tests/test_utils.py",
-        "tests/test_hybrid_backend.py",
-        "tests/test_trino_client.py",
-        "tests/test_query_orchestrator.py",
-        "scripts/ingest_flight.py",
-        "scripts/create_tenant.py",
-        "scripts/delete_tenant.py",
-        "scripts/query_trino.py",
-        "scripts/setup_iceberg_tables.py",
-        "scripts/run_dbt.py",
-        "scripts/demonstrate_architecture.py",
+    present_files = [py_file for py_file in PYTHON_FILES if check_file_exists(py_file)]
+    with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as executor:
+        outcomes = list(executor.map(check_syntax, present_files))
+    syntax_checks = [
+        report_outcome(f"Syntax check: {py_file}", outcome)
+        for py_file, outcome in zip(present_files, outcomes)
     ]
     
-    syntax_checks = []
-    for py_file in python_files:
-        if Path(py_file).exists():
-            syntax_checks.append(run_command(f"python -m py_compile {py_file}", f"Syntax check: {py_file}"))
-    
     # Check TOML syntax
     print("\nConfiguration Check:")
     config_checks = []
-    config_checks.append(run_command("python -c \"import tomllib; open('pyproject.toml', 'rb').read()\"", "TOML syntax check"))
+    config_checks.append(report_outcome("TOML syntax check", check_toml("pyproject.toml")))
     
     # Summary
     print("\nValidation Summary:")
@@ -1,14 +1,69 @@
 """
 XORQ API for orchestration control, tenant registration, and metadata/query endpoint exposure.
 """
+import asyncio
+import json
 import logging
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from xorq.core import xorq_registry
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Tuple, Type, TypeVar
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+from xorq.core import close_xorq_registry, get_xorq_registry
 
 logger = logging.getLogger("xorq.api")
 
-app = FastAPI(title="DataHut XORQ Orchestration API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the registry (and replay its log) before serving, close it on shutdown
+    await asyncio.to_thread(get_xorq_registry)
+    yield
+    await asyncio.to_thread(close_xorq_registry)
+    _tenant_json_cache.clear()
+
+app = FastAPI(title="DataHut XORQ Orchestration API", lifespan=lifespan)
+
+# (tenant_id, field) -> (revision, JSON body); one entry per pair, replaced when the revision moves
+_tenant_json_cache: Dict[Tuple[str, str], Tuple[int, bytes]] = {}
+
+def _tenant_response(tenant_id: str, field: str) -> Response:
+    tenant = get_xorq_registry().get_tenant_info(tenant_id)
+    if not tenant:
+        raise HTTPException(status_code=404, detail="No such tenant")
+    revision = tenant.revision
+    cached = _tenant_json_cache.get((tenant_id, field))
+    if cached is None or cached[0] != revision:
+        cached = (revision, json.dumps(getattr(tenant, field)).encode())
+        _tenant_json_cache[(tenant_id, field)] = cached
+    return Response(content=cached[1], media_type="application/json")
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+def body_as(model: Type[ModelT]) -> ModelT:
+    """Validate the raw request body straight from JSON bytes into ``model``.
+    
+    pydantic-core parses and validates in one pass, without first building the
+    intermediate dict FastAPI would decode for a plain body parameter.
+    """
+    async def parse(request: Request) -> ModelT:
+        try:
+            return model.model_validate_json(await request.body())
+        except ValidationError as e:
+            raise RequestValidationError(e.errors(include_url=False))
+    return Depends(parse)
+
+def body_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """``openapi_extra`` documenting ``model`` as the JSON body that body_as() reads.
+    
+    FastAPI does not see a body behind a custom dependency, so without this the
+    payload would be missing from /docs.
+    """
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": model.model_json_schema()}},
+        }
+    }
 
 class TenantCreateRequest(BaseModel):
     tenant_id: str
@@ -23,64 +78,52 @@ class QueryMetricRequest(BaseModel):
     query: str
     meta: dict
 
-@app.post("/tenants/register")
-def register_tenant(data: TenantCreateRequest):
-    xorq_registry.register_tenant(data.tenant_id, data.config)
+# Mutations append to the registry's log file, so they run in a worker thread
+# rather than blocking the event loop on disk writes and lock waits
+
+@app.post("/tenants/register", openapi_extra=body_schema(TenantCreateRequest))
+async def register_tenant(data: TenantCreateRequest = body_as(TenantCreateRequest)):
+    await asyncio.to_thread(get_xorq_registry().register_tenant, data.tenant_id, data.config)
     return {"status": "ok"}
 
-@app.post("/datasets/register")
-def register_dataset(data: DatasetRegisterRequest):
-    xorq_registry.add_dataset(data.tenant_id, data.dataset)
+@app.post("/datasets/register", openapi_extra=body_schema(DatasetRegisterRequest))
+async def register_dataset(data: DatasetRegisterRequest = body_as(DatasetRegisterRequest)):
+    await asyncio.to_thread(get_xorq_registry().add_dataset, data.tenant_id, data.dataset)
     return {"status": "ok"}
 
 @app.post("/catalogs/add")
-def register_catalog(tenant_id: str, catalog: str):
-    xorq_registry.add_catalog(tenant_id, catalog)
+async def register_catalog(tenant_id: str, catalog: str):
+    await asyncio.to_thread(get_xorq_registry().add_catalog, tenant_id, catalog)
     return {"status": "ok"}
 
 @app.get("/tenants/list")
-def list_tenants():
-    return xorq_registry.list_tenants()
+async def list_tenants():
+    return Response(content=get_xorq_registry().tenants_json(), media_type="application/json")
 
 @app.get("/tenants/info/{tenant_id}")
-def tenant_info(tenant_id: str):
-    meta = xorq_registry.get_tenant_info(tenant_id)
-    if not meta:
-        raise HTTPException(status_code=404, detail="No such tenant")
-    return meta.config
+async def tenant_info(tenant_id: str):
+    return _tenant_response(tenant_id, "config")
 
 @app.get("/tenants/all_metadata")
-def all_metadata():
-    summary = {k: v.config for k, v in xorq_registry.all_metadata().items()}
-    return summary
+async def all_metadata():
+    return Response(content=get_xorq_registry().all_metadata_json(), media_type="application/json")
 
-@app.post("/track_query_metric")
-def track_query_metric(data: QueryMetricRequest):
-    xorq_registry.track_query_metric(data.tenant_id, data.query, data.meta)
+@app.post("/track_query_metric", openapi_extra=body_schema(QueryMetricRequest))
+async def track_query_metric(data: QueryMetricRequest = body_as(QueryMetricRequest)):
+    await asyncio.to_thread(get_xorq_registry().track_query_metric, data.tenant_id, data.query, data.meta)
     return {"status": "ok"}
 
 @app.get("/tenants/{tenant_id}/metrics")
-def tenant_metrics(tenant_id: str):
-    tenant = xorq_registry.get_tenant_info(tenant_id)
-    if not tenant:
-        raise HTTPException(status_code=404, detail="No such tenant")
-    return tenant.metrics
+async def tenant_metrics(tenant_id: str):
+    return _tenant_response(tenant_id, "metric_log")
 
 @app.get("/tenants/{tenant_id}/billing")
-def tenant_billing(tenant_id: str):
-    tenant = xorq_registry.get_tenant_info(tenant_id)
-    if not tenant:
-        raise HTTPException(status_code=404, detail="No such tenant")
-    summary = {
-        "total_bill_events": len(tenant.billing),
-        "total_amount": sum(event["amount"] for event in tenant.billing),
-        "events": tenant.billing,
-    }
-    return summary
+async def tenant_billing(tenant_id: str):
+    return _tenant_response(tenant_id, "billing_summary")
 
 @app.get("/catalogs/tenant/{catalog_name}")
-def catalog_to_tenant(catalog_name: str):
-    tid = xorq_registry.find_tenant_by_catalog(catalog_name)
+async def catalog_to_tenant(catalog_name: str):
+    tid = get_xorq_registry().find_tenant_by_catalog(catalog_name)
     if not tid:
         raise HTTPException(status_code=404, detail="No tenant for this catalog")
     return {"tenant_id": tid}
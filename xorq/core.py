@@ -1,62 +1,370 @@
 """
 XORQ Core Orchestration API and Registry (foundation for multi-tenant SaaS)
 """
+import os
+import json
+import time
 import logging
+from array import array
+from collections import deque
 from typing import Dict, List, Optional, Any
 from pathlib import Path
-from datetime import datetime
-from threading import Lock
+from datetime import datetime, timedelta
+from threading import Event, Lock, RLock, Thread
 
 logger = logging.getLogger("xorq.core")
 
+# Tenants hash onto this many locks, so writes for different tenants rarely contend
+LOCK_STRIPES = 64
+# Query metrics kept per tenant unless its config sets "metrics_cap"
+DEFAULT_METRICS_CAP = 10_000
+# Log entries written before the state is snapshotted and the log rotated
+SNAPSHOT_EVERY = 10_000
+
+_EPOCH = datetime(1970, 1, 1)
+
+def format_ts(ns: int) -> str:
+    """Format a time.time_ns() timestamp as a naive UTC ISO string."""
+    return (_EPOCH + timedelta(microseconds=ns // 1000)).isoformat()
+
 class TenantMetadata:
     """Core metadata and metric log for a SaaS tenant."""
-    def __init__(self, tenant_id: str, config: Dict[str, Any]):
+    def __init__(self, tenant_id: str, config: Dict[str, Any], ts: Optional[int] = None, lock: Optional[Lock] = None):
         self.tenant_id = tenant_id
+        # Held by writers; the orchestrator passes the tenant's stripe lock
+        self.lock = lock or Lock()
         self.config = config
         self.datasets = []   # List of dataset dicts
-        self.catalogs = []   # List of Trino/Hive catalog names
-        self.created_at = datetime.utcnow()
-        self.updated_at = datetime.utcnow()
-        self.metrics = []    # List of {query, ts, engine, row_count, ...}
-        self.billing = []    # List of billing events ({amount, type, ts, ...})
+        self.catalogs = []   # List of Trino/Hive catalog names, in insertion order
+        self._catalog_set = set()  # Same names, for O(1) membership checks
+        # Timestamps are time.time_ns() integers, formatted only when served
+        self.created_at = time.time_ns() if ts is None else ts
+        self.updated_at = self.created_at
+        # Most recent {query, ts, engine, row_count, ...} entries; older ones are dropped
+        self.metrics = deque(maxlen=config.get("metrics_cap", DEFAULT_METRICS_CAP))
+        # Billing events stored column-wise; bill_total is kept as a running sum
+        self.bill_amounts = array("q")
+        self.bill_ts = []
+        self.bill_types = []
+        self.bill_total = 0
+        self.revision = 0    # Bumped after every change; keys cached API responses
+
+    @property
+    def metric_log(self) -> List[Dict[str, Any]]:
+        """Query metrics with ISO timestamps, oldest first."""
+        with self.lock:
+            metrics = list(self.metrics)
+        return [{**metric, "ts": format_ts(metric["ts"])} for metric in metrics]
+
+    def _copy_bill_events(self):
+        """Return the (ts, amount, type) events and the running total, copied under the lock."""
+        with self.lock:
+            return list(zip(self.bill_ts, self.bill_amounts, self.bill_types)), self.bill_total
+
+    @staticmethod
+    def _format_bill_events(events) -> List[Dict[str, Any]]:
+        return [{"ts": format_ts(ts), "amount": amount, "type": bill_type} for ts, amount, bill_type in events]
+
+    @property
+    def billing(self) -> List[Dict[str, Any]]:
+        """Billing events as a list of {ts, amount, type} dicts with ISO timestamps."""
+        events, _ = self._copy_bill_events()
+        return self._format_bill_events(events)
+
+    @property
+    def billing_summary(self) -> Dict[str, Any]:
+        """Billing event count, running total and the events themselves."""
+        events, total = self._copy_bill_events()
+        return {
+            "total_bill_events": len(events),
+            "total_amount": total,
+            "events": self._format_bill_events(events),
+        }
+
+    def add_bill_event(self, ts: int, amount: int, bill_type: str):
+        self.bill_ts.append(ts)
+        self.bill_amounts.append(amount)
+        self.bill_types.append(bill_type)
+        self.bill_total += amount
+
+    def touch(self, ts: Optional[int] = None):
+        """Record a config/dataset change: refresh updated_at and bump the revision."""
+        self.updated_at = time.time_ns() if ts is None else ts
+        self.revision += 1
 
 class XORQOrchestrator:
     """Central multi-tenant registry, orchestrator and service discovery for the data platform."""
     def __init__(self, storage_path: str = "xorq/metadata.db"):
         self.tenants: Dict[str, TenantMetadata] = {}
         self.catalog_index: Dict[str, str] = {}  # mapping catalog -> tenant
-        self.lock = Lock()
+        self.locks = [Lock() for _ in range(LOCK_STRIPES)]
+        self.catalog_lock = RLock()
+        # Serialized /tenants/list and /tenants/all_metadata bodies, dropped on change
+        self._json_lock = Lock()
+        self._tenants_json: Optional[bytes] = None
+        self._all_meta_json: Optional[bytes] = None
+        # Mutations are appended to a JSON-lines log next to the snapshot file
         self.storage_path = Path(storage_path)
+        self.wal_path = self.storage_path.with_suffix(".jsonl")
+        # The log being folded into a snapshot, kept until that snapshot is on disk
+        self.prev_wal_path = self.storage_path.with_suffix(".prev.jsonl")
+        self._wal = None
+        self._wal_lock = Lock()
+        self._wal_entries = 0
+        # Each log starts with its generation; a snapshot covers every earlier one
+        self._generation = 0
+        # Snapshots are written by a background thread, off the request path
+        self._snapshot_lock = Lock()
+        self._snapshot_wanted = Event()
+        self._closing = False
         self._load_metadata()
+        self.storage_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.prev_wal_path.exists():
+            # A snapshot was interrupted; fold everything replayed into a new one
+            self._fold_logs()
+        else:
+            self._open_log()
+        self._snapshotter = Thread(target=self._snapshot_loop, name="xorq-snapshot", daemon=True)
+        self._snapshotter.start()
 
     def _load_metadata(self):
-        # (Optional) Load from persistent storage/file if platform requires it
-        # For now, keep in-memory for first implementation
-        pass
+        """Restore the last snapshot, then replay the mutation logs written since.
+        
+        Runs before the log is opened, so the replayed calls are not logged again.
+        """
+        if self.storage_path.exists():
+            state = json.loads(self.storage_path.read_bytes())
+            self._restore_snapshot(state)
+            self._generation = state.get("generation", 0)
+        covered = self._generation
+        for path in (self.prev_wal_path, self.wal_path):
+            self._replay_log(path, covered)
+        logger.info(f"Replayed {self._wal_entries} entries from {self.wal_path}")
 
-    def register_tenant(self, tenant_id: str, config: Dict[str, Any]):
-        with self.lock:
+    def _replay_log(self, path: Path, covered: int):
+        """Apply one log file, unless its generation is older than the snapshot's."""
+        if not path.exists():
+            return
+        with open(path, "rb") as wal:
+            for line in wal:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Skipping unreadable entry in {path}")
+                    continue
+                op = entry.pop("op")
+                if op == "generation":
+                    if entry["generation"] < covered:
+                        logger.info(f"Skipping {path}, already covered by the snapshot")
+                        return
+                    self._generation = max(self._generation, entry["generation"])
+                    continue
+                getattr(self, op)(**entry)
+                self._wal_entries += 1
+
+    def _restore_snapshot(self, state: Dict[str, Any]):
+        for tenant_id, saved in state["tenants"].items():
+            tenant = TenantMetadata(tenant_id, saved["config"], saved["created_at"], self._lock_for(tenant_id))
+            tenant.datasets = saved["datasets"]
+            tenant.catalogs = saved["catalogs"]
+            tenant._catalog_set = set(saved["catalogs"])
+            tenant.updated_at = saved["updated_at"]
+            tenant.metrics.extend(saved["metrics"])
+            for ts, amount, bill_type in zip(saved["bill_ts"], saved["bill_amounts"], saved["bill_types"]):
+                tenant.add_bill_event(ts, amount, bill_type)
+            self.tenants[tenant_id] = tenant
+        self.catalog_index.update(state["catalog_index"])
+
+    def _capture_state(self) -> Dict[str, Any]:
+        """Copy everything a snapshot holds; call with every lock held."""
+        return {
+            "generation": self._generation,
+            "tenants": {
+                tenant_id: {
+                    "config": dict(tenant.config),
+                    "datasets": list(tenant.datasets),
+                    "catalogs": list(tenant.catalogs),
+                    "created_at": tenant.created_at,
+                    "updated_at": tenant.updated_at,
+                    "metrics": list(tenant.metrics),
+                    "bill_ts": list(tenant.bill_ts),
+                    "bill_amounts": tenant.bill_amounts.tolist(),
+                    "bill_types": list(tenant.bill_types),
+                }
+                for tenant_id, tenant in self.tenants.items()
+            },
+            "catalog_index": dict(self.catalog_index),
+        }
+
+    def _write_snapshot(self, state: Dict[str, Any]):
+        tmp_path = self.storage_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(state))
+        os.replace(tmp_path, self.storage_path)
+        logger.info(f"Snapshotted {len(state['tenants'])} tenants to {self.storage_path}")
+
+    def _open_log(self, truncate: bool = False):
+        """Open the mutation log for appending; a new or emptied log starts with its generation."""
+        if self._wal is not None:
+            self._wal.close()
+        if not truncate:
+            self._trim_torn_tail()
+        self._wal = open(self.wal_path, "wb" if truncate else "ab", buffering=0)
+        if self._wal.tell() == 0:
+            self._wal.write(json.dumps({"op": "generation", "generation": self._generation}).encode() + b"\n")
+
+    def _trim_torn_tail(self):
+        """Cut a partially written last entry off the log, so the next entry starts on its own line."""
+        if not self.wal_path.exists():
+            return
+        with open(self.wal_path, "r+b") as wal:
+            end = wal.seek(0, os.SEEK_END)
+            keep = end
+            # Walk back in blocks to just past the last newline
+            while keep > 0:
+                step = min(4096, keep)
+                wal.seek(keep - step)
+                newline = wal.read(step).rfind(b"\n")
+                if newline != -1:
+                    keep += newline + 1 - step
+                    break
+                keep -= step
+            if keep < end:
+                wal.truncate(keep)
+                logger.warning(f"Dropped a partial entry of {end - keep} bytes from {self.wal_path}")
+
+    def _fold_logs(self):
+        """Snapshot the current state in place and start an empty log; writers must be paused.
+        
+        Used when a rotated log is still on disk, so there is nowhere to rotate to.
+        A crash at any step leaves either the old snapshot with both logs, or the
+        new snapshot with logs whose generations it already covers.
+        """
+        self._generation += 1
+        self._write_snapshot(self._capture_state())
+        self._open_log(truncate=True)
+        self.prev_wal_path.unlink(missing_ok=True)
+        self._wal_entries = 0
+
+    def _log(self, op: str, **args):
+        """Append one mutation to the log; call with the tenant's lock held."""
+        line = json.dumps({"op": op, **args}).encode() + b"\n"
+        with self._wal_lock:
+            if self._wal is None:
+                return
+            self._wal.write(line)
+            self._wal_entries += 1
+
+    def _maybe_snapshot(self):
+        """Wake the snapshot thread once the log holds SNAPSHOT_EVERY entries.
+        
+        Does nothing while the log is being replayed.
+        """
+        if self._wal is not None and self._wal_entries >= SNAPSHOT_EVERY:
+            self._snapshot_wanted.set()
+
+    def _snapshot_loop(self):
+        while True:
+            self._snapshot_wanted.wait()
+            self._snapshot_wanted.clear()
+            if self._closing:
+                return
+            try:
+                self.snapshot()
+            except Exception as e:
+                logger.error(f"Snapshot of {self.storage_path} failed: {e}")
+
+    def snapshot(self):
+        """Fold the mutation log into the snapshot file.
+        
+        Writers are paused only while the state is copied and the log is renamed
+        aside; the snapshot is serialized and written after they resume. The
+        renamed log is deleted once the snapshot has replaced the old one. Takes
+        every tenant lock, then the catalog and log locks, in the same order as
+        the writers.
+        """
+        with self._snapshot_lock:
+            locks = [*self.locks, self.catalog_lock, self._wal_lock]
+            for lock in locks:
+                lock.acquire()
+            try:
+                if self._wal is None:
+                    return
+                if self.prev_wal_path.exists():
+                    # An earlier snapshot failed after rotating; fold both logs in now
+                    self._fold_logs()
+                    return
+                self._wal.close()
+                self._wal = None
+                try:
+                    os.replace(self.wal_path, self.prev_wal_path)
+                    self._generation += 1
+                finally:
+                    self._open_log()
+                self._wal_entries = 0
+                state = self._capture_state()
+            finally:
+                for lock in reversed(locks):
+                    lock.release()
+            self._write_snapshot(state)
+            self.prev_wal_path.unlink()
+
+    def close(self):
+        """Stop the snapshot thread and close the mutation log."""
+        self._closing = True
+        self._snapshot_wanted.set()
+        self._snapshotter.join()
+        with self._wal_lock:
+            if self._wal is not None:
+                self._wal.close()
+                self._wal = None
+
+    def _lock_for(self, tenant_id: str) -> Lock:
+        return self.locks[hash(tenant_id) % LOCK_STRIPES]
+
+    def _invalidate_json(self):
+        with self._json_lock:
+            self._tenants_json = None
+            self._all_meta_json = None
+
+    def register_tenant(self, tenant_id: str, config: Dict[str, Any], ts: Optional[int] = None):
+        """Register a tenant or update its config; ``ts`` is only passed when replaying the log."""
+        if ts is None:
+            ts = time.time_ns()
+        with self._lock_for(tenant_id):
             if tenant_id not in self.tenants:
-                self.tenants[tenant_id] = TenantMetadata(tenant_id, config)
+                self.tenants[tenant_id] = TenantMetadata(tenant_id, config, ts, self._lock_for(tenant_id))
                 logger.info(f"Registered new tenant: {tenant_id}")
             else:
                 logger.warning(f"Tenant {tenant_id} already exists—updating config.")
                 self.tenants[tenant_id].config.update(config)
-                self.tenants[tenant_id].updated_at = datetime.utcnow()
+                self.tenants[tenant_id].touch(ts)
+            self._log("register_tenant", tenant_id=tenant_id, config=config, ts=ts)
+            self._invalidate_json()
+        self._maybe_snapshot()
 
-    def add_dataset(self, tenant_id: str, dataset: Dict[str, Any]):
-        with self.lock:
+    def add_dataset(self, tenant_id: str, dataset: Dict[str, Any], ts: Optional[int] = None):
+        """Attach a dataset to a tenant; ``ts`` is only passed when replaying the log."""
+        if ts is None:
+            ts = time.time_ns()
+        with self._lock_for(tenant_id):
             if tenant_id in self.tenants:
                 self.tenants[tenant_id].datasets.append(dataset)
+                self.tenants[tenant_id].touch(ts)
                 logger.info(f"Registered dataset for tenant {tenant_id}: {dataset.get('name')}")
+            self._log("add_dataset", tenant_id=tenant_id, dataset=dataset, ts=ts)
+        self._maybe_snapshot()
 
     def add_catalog(self, tenant_id: str, catalog_name: str):
-        with self.lock:
-            self.catalog_index[catalog_name] = tenant_id
-            if tenant_id in self.tenants and catalog_name not in self.tenants[tenant_id].catalogs:
-                self.tenants[tenant_id].catalogs.append(catalog_name)
+        with self._lock_for(tenant_id):
+            with self.catalog_lock:
+                self.catalog_index[catalog_name] = tenant_id
+            tenant = self.tenants.get(tenant_id)
+            if tenant and catalog_name not in tenant._catalog_set:
+                tenant._catalog_set.add(catalog_name)
+                tenant.catalogs.append(catalog_name)
             logger.info(f"Catalog {catalog_name} linked to tenant {tenant_id}")
+            self._log("add_catalog", tenant_id=tenant_id, catalog_name=catalog_name)
+        self._maybe_snapshot()
 
     def list_tenants(self) -> List[str]:
         return list(self.tenants.keys())
@@ -70,9 +378,27 @@ class XORQOrchestrator:
     def all_metadata(self) -> Dict[str, TenantMetadata]:
         return self.tenants
 
-    def track_query_metric(self, tenant_id: str, query: str, meta: Dict[str, Any]):
+    def tenants_json(self) -> bytes:
+        """JSON array of tenant ids, rebuilt only after a tenant is registered."""
+        with self._json_lock:
+            if self._tenants_json is None:
+                self._tenants_json = json.dumps(list(self.tenants)).encode()
+            return self._tenants_json
+
+    def all_metadata_json(self) -> bytes:
+        """JSON object of tenant id -> config, rebuilt only after a config change."""
+        with self._json_lock:
+            if self._all_meta_json is None:
+                summary = {tenant_id: tenant.config for tenant_id, tenant in self.tenants.items()}
+                self._all_meta_json = json.dumps(summary).encode()
+            return self._all_meta_json
+
+    def track_query_metric(self, tenant_id: str, query: str, meta: Dict[str, Any], ts: Optional[int] = None):
+        """Record a query metric; ``ts`` is only passed when replaying the log."""
         logger.info(f"Tenant {tenant_id} ran query {query[:50]}... metrics: {meta}")
-        with self.lock:
+        if ts is None:
+            ts = time.time_ns()
+        with self._lock_for(tenant_id):
             tenant = self.tenants.get(tenant_id)
             if tenant:
                 metric = {
@@ -80,7 +406,7 @@ class XORQOrchestrator:
                     "meta": meta,
                     "engine": meta.get("engine"),
                     "table": meta.get("table"),
-                    "ts": datetime.utcnow(),
+                    "ts": ts,
                     "rows": meta.get("rows"),
                     "latency": meta.get("latency", 0),
                 }
@@ -88,10 +414,29 @@ class XORQOrchestrator:
                 # If this is a "billable" query, log a billing event (basic example)
                 if meta.get("bill", False):
                     usage = max(1, int(meta.get("rows", 0)) // 1000)  # Bill per 1k rows, as ex.
-                    bill_evt = {"ts": metric["ts"], "amount": usage, "type": meta.get("engine", "query")}
-                    tenant.billing.append(bill_evt)
-                    logger.info(f"Bill event for tenant {tenant_id}: {bill_evt}")
+                    bill_type = meta.get("engine", "query")
+                    tenant.add_bill_event(metric["ts"], usage, bill_type)
+                    logger.info(f"Bill event for tenant {tenant_id}: {usage} ({bill_type})")
+                tenant.revision += 1
+            self._log("track_query_metric", tenant_id=tenant_id, query=query, meta=meta, ts=ts)
+        self._maybe_snapshot()
+
+# Singleton pattern; opened on first use so importing this module touches no files
+_registry: Optional[XORQOrchestrator] = None
+_registry_lock = Lock()
 
-# Singleton pattern
-xorq_registry = XORQOrchestrator()
+def get_xorq_registry() -> XORQOrchestrator:
+    """Return the process-wide registry, stored at $XORQ_STORAGE (default xorq/metadata.db)."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = XORQOrchestrator(os.getenv("XORQ_STORAGE", "xorq/metadata.db"))
+        return _registry
 
+def close_xorq_registry():
+    """Close the process-wide registry, if it was opened."""
+    global _registry
+    with _registry_lock:
+        if _registry is not None:
+            _registry.close()
+            _registry = None
@@ -1,9 +1,17 @@
 # XORQ FastAPI Docker Entrypoint
 # Use this script as the entrypoint for the xorq orchestration API service
 
+import os
 import uvicorn
-from xorq.api import app
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=9980, log_level="info")
-
+    # loop/http stay on "auto": uvloop and httptools (from uvicorn[standard]) are
+    # used when installed. The tenant registry lives in process memory, so keep a
+    # single worker until it moves to shared storage.
+    uvicorn.run(
+        "xorq.api:app",
+        host="0.0.0.0",
+        port=9980,
+        workers=int(os.getenv("XORQ_WORKERS", "1")),
+        log_level="info",
+    )